@@ -3,7 +3,7 @@ CREATE DATABASE Bash_db;
 CREATE TABLE users (
 	user_id INT AUTO_INCREMENT PRIMARY KEY,
     username VARCHAR(20) UNIQUE NOT NULL,
-    password VARCHAR(64) NOT NULL,
+    password VARCHAR(255) NOT NULL,
     name VARCHAR(100) NOT NULL,
     address VARCHAR(200) NOT NULL,
     aadhaar VARCHAR(12) NOT NULL,
@@ -16,10 +16,12 @@ CREATE TABLE cards (
 	card_id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT NOT NULL,
     card_number VARCHAR(16) UNIQUE NOT NULL,
+    card_last4 CHAR(4) NOT NULL,
     card_type ENUM('Debit','Credit') NOT NULL,
     pin VARCHAR(4) NOT NULL,
     cvv VARCHAR(3) NOT NULL,
-    FOREIGN KEY(user_id) REFERENCES users(user_id)
+    FOREIGN KEY(user_id) REFERENCES users(user_id),
+    INDEX idx_cards_user_last4 (user_id, card_last4)
 );
 
 CREATE TABLE transactions (
@@ -28,7 +30,10 @@ CREATE TABLE transactions (
     amount DECIMAL(10, 2) NOT NULL,
     beneficiary_account VARCHAR(10) NOT NULL,
     transaction_date DATETIME NOT NULL,
-    FOREIGN KEY (user_id) REFERENCES users(user_id)
+    idempotency_key VARCHAR(64),
+    FOREIGN KEY (user_id) REFERENCES users(user_id),
+    INDEX idx_transactions_user_date (user_id, transaction_date, transaction_id),
+    UNIQUE INDEX uq_transactions_user_key (user_id, idempotency_key)
 );
 
 CREATE TABLE beneficiaries (
@@ -36,5 +41,39 @@ CREATE TABLE beneficiaries (
     user_id INT NOT NULL,
     name VARCHAR(100) NOT NULL,
     account_number VARCHAR(10) NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(user_id),
+    INDEX idx_beneficiaries_user_account (user_id, account_number)
+);
+
+CREATE TABLE daily_balances (
+    user_id INT NOT NULL,
+    day DATE NOT NULL,
+    debit_count INT NOT NULL DEFAULT 0,
+    total_amount DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    closing_balance DECIMAL(10, 2) NOT NULL,
+    PRIMARY KEY (user_id, day),
     FOREIGN KEY (user_id) REFERENCES users(user_id)
 );
+
+CREATE TABLE id_blocks (
+    name VARCHAR(32) PRIMARY KEY,
+    next_value BIGINT NOT NULL
+);
+
+CREATE TABLE transfer_outbox (
+    outbox_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    payee_user_id INT NOT NULL,
+    account_number VARCHAR(10) NOT NULL,
+    amount DECIMAL(10, 2) NOT NULL,
+    created_at DATETIME NOT NULL,
+    delivered_at DATETIME,
+    INDEX idx_transfer_outbox_pending (delivered_at, outbox_id)
+);
+
+CREATE TABLE transfer_credits (
+    credit_key VARCHAR(80) PRIMARY KEY,
+    user_id INT NOT NULL,
+    amount DECIMAL(10, 2) NOT NULL,
+    applied_at DATETIME NOT NULL
+);
@@ -0,0 +1,195 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from backends import SQLiteBackend
+from database import Database
+
+def _money(value):
+    return None if value is None else Decimal(str(value)).quantize(Decimal('0.01'))
+
+def _timestamp(value):
+    return value if value is None or isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+def _day(value):
+    if value is None or (isinstance(value, date) and not isinstance(value, datetime)):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+# Exported tables: query plus (column, arrow type, converter). Password hashes are never exported.
+EXPORTS = {
+    'users': (
+        "SELECT user_id, username, name, account_number, balance FROM users ORDER BY user_id",
+        [('user_id', 'int64', int), ('username', 'string', str), ('name', 'string', str),
+         ('account_number', 'string', str), ('balance', 'money', _money)],
+    ),
+    'transactions': (
+        "SELECT transaction_id, user_id, amount, beneficiary_account, transaction_date FROM transactions ORDER BY transaction_id",
+        [('transaction_id', 'int64', int), ('user_id', 'int64', int), ('amount', 'money', _money),
+         ('beneficiary_account', 'string', str), ('transaction_date', 'timestamp', _timestamp)],
+    ),
+    'daily_balances': (
+        "SELECT user_id, day, debit_count, total_amount, closing_balance FROM daily_balances ORDER BY user_id, day",
+        [('user_id', 'int64', int), ('day', 'date', _day), ('debit_count', 'int64', int),
+         ('total_amount', 'money', _money), ('closing_balance', 'money', _money)],
+    ),
+}
+
+def backfill_daily_balances(db, users_per_chunk=500):
+    """Rebuild daily_balances from the ledger for every user, chunk by chunk.
+
+    Closing balances are derived backwards from the current balance, so run
+    this while transfers are paused. Only needed once for history that
+    predates the incremental rollups written by BankSystem. Database errors
+    are raised.
+    """
+
+    query = f"""
+    INSERT INTO daily_balances (user_id, day, debit_count, total_amount, closing_balance)
+    VALUES (%s, %s, %s, %s, %s)
+    {db.backend.upsert_clause('daily_balances', ('user_id', 'day'), replace=('debit_count', 'total_amount', 'closing_balance'))}
+    """
+    last_user_id, written = 0, 0
+    while True:
+        # One transaction per chunk; database errors are raised rather than
+        # read as an empty chunk, which would end the backfill early
+        with db.transaction() as cursor:
+            cursor.execute("SELECT user_id, balance FROM users WHERE user_id > %s ORDER BY user_id LIMIT %s",
+                           (last_user_id, users_per_chunk))
+            users = cursor.fetchall()
+            if not users:
+                return written
+            last_user_id = users[-1]['user_id']
+            balances = {row['user_id']: _money(row['balance']) for row in users}
+
+            placeholders = ', '.join(['%s'] * len(balances))
+            cursor.execute(f"""
+            SELECT user_id, DATE(transaction_date) AS day, COUNT(*) AS debit_count, SUM(amount) AS total_amount
+            FROM transactions WHERE user_id IN ({placeholders})
+            GROUP BY user_id, DATE(transaction_date)
+            ORDER BY user_id, day DESC
+            """, list(balances))
+            days = cursor.fetchall()
+
+            rows = []
+            for row in days:
+                # Walking newest to oldest, each day closes at the running balance,
+                # and its debits are added back to get the balance before it.
+                total = _money(row['total_amount'])
+                user_id = row['user_id']
+                rows.append((user_id, _day(row['day']), row['debit_count'], total, balances[user_id]))
+                balances[user_id] += total
+            if rows:
+                cursor.executemany(query, rows)
+        written += len(rows)
+
+class _CsvWriter:
+    def __init__(self, path, columns):
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([name for name, _, _ in columns])
+
+    def write_batch(self, columns, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+class _ArrowWriter:
+    """Chunked Parquet or Arrow IPC writer; needs pyarrow."""
+
+    def __init__(self, path, columns, fmt):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise RuntimeError("Parquet/Arrow export needs pyarrow: pip install pyarrow") from None
+        types = {'int64': pa.int64(), 'string': pa.string(), 'money': pa.decimal128(14, 2),
+                 'timestamp': pa.timestamp('us'), 'date': pa.date32()}
+        self._pa = pa
+        self.schema = pa.schema([(name, types[kind]) for name, kind, _ in columns])
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema)
+
+    def write_batch(self, columns, rows):
+        arrays = [self._pa.array([row[i] for row in rows], type=field.type)
+                  for i, field in enumerate(self.schema)]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+def export_table(db, table, path, fmt='parquet', batch_size=50000):
+    """Stream one table into a columnar (or CSV) file in batches, returning the row count.
+
+    Errors are raised, and the partly written file is removed first.
+    """
+
+    query, columns = EXPORTS[table]
+    writer = _CsvWriter(path, columns) if fmt == 'csv' else _ArrowWriter(path, columns, fmt)
+    count, batch = 0, []
+    try:
+        for row in db.stream_query(query, batch_size=min(batch_size, 5000)):
+            batch.append(tuple(convert(row[name]) for name, _, convert in columns))
+            if len(batch) >= batch_size:
+                writer.write_batch(columns, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_batch(columns, batch)
+            count += len(batch)
+    except BaseException:
+        writer.close()
+        os.remove(path)
+        raise
+    writer.close()
+    return count
+
+def export_all(db, out_dir, fmt='parquet', batch_size=50000, tables=None):
+    """Export users, transactions and daily_balances into out_dir, returning per-table stats."""
+
+    os.makedirs(out_dir, exist_ok=True)
+    extension = {'parquet': 'parquet', 'arrow': 'arrow', 'csv': 'csv'}[fmt]
+    summary = {}
+    for table in tables or EXPORTS:
+        started = time.perf_counter()
+        path = os.path.join(out_dir, f'{table}.{extension}')
+        rows = export_table(db, table, path, fmt, batch_size)
+        summary[table] = {'path': path, 'rows': rows, 'seconds': round(time.perf_counter() - started, 3)}
+    return summary
+
+def main():
+    """Command line entry point for the analytics jobs."""
+
+    parser = argparse.ArgumentParser(description="Daily rollups and analytics exports.")
+    parser.add_argument('--sqlite', metavar='DB', help="Use an SQLite database file instead of MySQL")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('backfill', help="Rebuild daily_balances from the transaction ledger")
+    export = sub.add_parser('export', help="Export tables to columnar files")
+    export.add_argument('--out', required=True, help="Output directory")
+    export.add_argument('--format', choices=['parquet', 'arrow', 'csv'], default='parquet')
+    export.add_argument('--batch-size', type=int, default=50000)
+    export.add_argument('--tables', nargs='+', choices=list(EXPORTS))
+    args = parser.parse_args()
+
+    db = Database(SQLiteBackend(args.sqlite)) if args.sqlite else Database()
+    try:
+        if args.command == 'backfill':
+            print(f"{backfill_daily_balances(db)} daily rows written")
+        else:
+            print(json.dumps(export_all(db, args.out, args.format, args.batch_size, args.tables), indent=2))
+    except db.errors as e:
+        print(f"{args.command} failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,574 @@
+import asyncio
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from backends import Backend, MySQLBackend, SCHEMA_FILE
+from banking import BankSystem
+from cache import TTLCache
+from identifiers import IdentifierAllocator, account_number
+from passwords import PasswordManager
+from database import Database, PoolTimeout
+from statements import StatementRegistry
+
+# What an async backend hands back for one statement; rows is None unless fetched.
+QueryResult = namedtuple('QueryResult', ['rows', 'rowcount', 'lastrowid'])
+
+
+class AioMySQLBackend:
+    """MySQL accessed through the aiomysql driver."""
+
+    name = 'aiomysql'
+
+    def __init__(self, config=None):
+        import aiomysql
+        self._driver = aiomysql
+        self._config = dict(config or MySQLBackend.DEFAULT_CONFIG)
+        config = dict(self._config)
+        config.pop('raise_on_warnings', None)
+        if 'database' in config:
+            config['db'] = config.pop('database')
+        self.config = config
+        self.errors = (aiomysql.Error,)
+
+    ddl = Backend.ddl
+    upsert_clause = Backend.upsert_clause
+
+    async def connect(self):
+        return await self._driver.connect(autocommit=False, **self.config)
+
+    async def execute(self, conn, query, params=(), fetch=False):
+        async with conn.cursor(self._driver.DictCursor) as cursor:
+            await cursor.execute(query, params or ())
+            rows = await cursor.fetchall() if fetch else None
+            return QueryResult(rows, cursor.rowcount, cursor.lastrowid)
+
+    async def executemany(self, conn, query, seq_of_params):
+        async with conn.cursor() as cursor:
+            await cursor.executemany(query, seq_of_params)
+            return QueryResult(None, cursor.rowcount, cursor.lastrowid)
+
+    async def begin(self, conn):
+        await conn.begin()
+
+    async def commit(self, conn):
+        await conn.commit()
+
+    async def rollback(self, conn):
+        await conn.rollback()
+
+    async def ping(self, conn):
+        await conn.ping(reconnect=True)
+
+    async def reset(self, conn):
+        """Roll back any open transaction; False if the connection is closed."""
+        if conn.closed:
+            return False
+        if conn.get_transaction_status():
+            await conn.rollback()
+        return True
+
+    def close_connection(self, conn):
+        conn.close()
+
+    def sync_backend(self):
+        """Blocking backend for the same server, for schema work."""
+        return MySQLBackend(dict(self._config))
+
+
+class AsyncLocalBackend:
+    """Stand-in async backend that runs a synchronous Backend (e.g. SQLiteBackend) on worker threads.
+
+    Each connection gets its own single worker thread, so a connection that
+    holds a lock can always make progress while others wait on it.
+    """
+
+    name = 'local'
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.errors = backend.errors
+        self.max_connections = backend.max_connections
+
+    def ddl(self, statement):
+        return self.backend.ddl(statement)
+
+    def upsert_clause(self, table, keys, increment=(), replace=(), derived=False):
+        return self.backend.upsert_clause(table, keys, increment, replace, derived)
+
+    async def _run(self, conn, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(conn.worker, func, *args)
+
+    async def connect(self):
+        worker = ThreadPoolExecutor(max_workers=1)
+        conn = await asyncio.get_running_loop().run_in_executor(worker, self.backend.connect)
+        conn.worker = worker
+        return conn
+
+    def _execute(self, conn, query, params, fetch):
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(query, params or ())
+            rows = cursor.fetchall() if fetch else None
+            return QueryResult(rows, cursor.rowcount, cursor.lastrowid)
+        finally:
+            cursor.close()
+
+    async def execute(self, conn, query, params=(), fetch=False):
+        return await self._run(conn, self._execute, conn, query, params, fetch)
+
+    def _executemany(self, conn, query, seq_of_params):
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(query, seq_of_params)
+            return QueryResult(None, cursor.rowcount, cursor.lastrowid)
+        finally:
+            cursor.close()
+
+    async def executemany(self, conn, query, seq_of_params):
+        return await self._run(conn, self._executemany, conn, query, list(seq_of_params))
+
+    async def begin(self, conn):
+        conn.autocommit = False
+
+    async def commit(self, conn):
+        await self._run(conn, conn.commit)
+
+    async def rollback(self, conn):
+        await self._run(conn, conn.rollback)
+
+    async def ping(self, conn):
+        await self._run(conn, self.backend.ping, conn)
+
+    @staticmethod
+    def _reset(conn):
+        if not conn.is_connected():
+            return False
+        if conn.in_transaction:
+            conn.rollback()
+        return True
+
+    async def reset(self, conn):
+        """Roll back any open transaction; False if the connection is closed."""
+        return await self._run(conn, self._reset, conn)
+
+    def sync_backend(self):
+        return self.backend
+
+    def close_connection(self, conn):
+        # The queued close still runs; only the event loop stops waiting for it
+        conn.worker.submit(conn.close)
+        conn.worker.shutdown(wait=False)
+
+
+class AsyncConnectionPool:
+    """Bounded asyncio pool of reusable connections."""
+
+    def __init__(self, backend, size=10, timeout=10.0, ping_interval=30.0):
+        self.backend = backend
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._idle = []
+        # Signalled whenever a connection is returned or a slot is freed
+        self._available = asyncio.Condition()
+        self._open = 0
+        self.stats = {'hits': 0, 'waits': 0, 'creations': 0, 'reconnects': 0, 'timeouts': 0}
+
+    async def _create(self):
+        """Open a new connection, giving back the reserved slot on failure."""
+        try:
+            conn = await self.backend.connect()
+        except BaseException:
+            await self._free_slot()
+            raise
+        self.stats['creations'] += 1
+        return conn
+
+    async def _free_slot(self):
+        async with self._available:
+            self._open -= 1
+            self._available.notify()
+
+    async def _check_health(self, conn, last_used):
+        if time.monotonic() - last_used < self.ping_interval:
+            return conn
+        try:
+            await self.backend.ping(conn)
+            return conn
+        except self.backend.errors:
+            self.stats['reconnects'] += 1
+            # The replacement keeps the dead connection's slot
+            self._close(conn)
+            return await self._create()
+
+    def _close(self, conn):
+        try:
+            self.backend.close_connection(conn)
+        except Exception:
+            pass
+
+    async def _discard(self, conn):
+        """Close a broken connection and give its slot to a waiter."""
+        self._close(conn)
+        await self._free_slot()
+
+    async def acquire(self):
+        """Check out a connection, waiting up to the pool timeout.
+
+        A waiter takes the first connection returned, or opens a new one as
+        soon as a broken connection is discarded and frees its slot.
+        """
+        deadline = None
+        async with self._available:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    self.stats['hits'] += 1
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    conn = None
+                    break
+                if deadline is None:
+                    self.stats['waits'] += 1
+                    deadline = time.monotonic() + self.timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise PoolTimeout(f"No connection available within {self.timeout}s")
+                try:
+                    await asyncio.wait_for(self._available.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        if conn is None:
+            return await self._create()
+        return await self._check_health(conn, last_used)
+
+    async def release(self, conn):
+        """Return a connection to the pool, dropping it if it is broken."""
+        try:
+            usable = await self.backend.reset(conn)
+        except self.backend.errors:
+            usable = False
+        if not usable:
+            await self._discard(conn)
+            return
+        async with self._available:
+            self._idle.append((conn, time.monotonic()))
+            self._available.notify()
+
+    def close(self):
+        """Close every idle connection."""
+        idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._open -= 1
+            self._close(conn)
+
+    def snapshot(self):
+        """Return pool counters along with current occupancy."""
+        stats = dict(self.stats)
+        stats.update(open=self._open, idle=len(self._idle), size=self.size)
+        return stats
+
+
+class AsyncTransaction:
+    """Statement runner bound to one connection for the life of a transaction."""
+
+    def __init__(self, backend, conn, statements=None):
+        self.backend = backend
+        self.conn = conn
+        self.statements = statements
+
+    async def execute(self, query, params=(), fetch=False):
+        return await self.backend.execute(self.conn, query, params, fetch)
+
+    async def executemany(self, query, seq_of_params):
+        return await self.backend.executemany(self.conn, query, seq_of_params)
+
+    async def run(self, name, params=(), fetch=False):
+        """Execute a named registry statement; async drivers have no prepared cursors, so only the text is shared."""
+        self.statements.count(name)
+        return await self.execute(self.statements.sql[name], params, fetch)
+
+    async def run_many(self, name, seq_of_params):
+        self.statements.count(name)
+        return await self.executemany(self.statements.sql[name], seq_of_params)
+
+
+class AsyncDatabase:
+    """Asyncio counterpart of Database, backed by an async connection pool."""
+
+    def __init__(self, backend=None, pool_size=10, pool_timeout=10.0, ping_interval=30.0, statements=None):
+        self.backend = backend or AioMySQLBackend()
+        self.statements = statements or StatementRegistry(self.backend)
+        self.errors = self.backend.errors + (PoolTimeout,)
+        if getattr(self.backend, 'max_connections', None):
+            pool_size = min(pool_size, self.backend.max_connections)
+        self.pool = AsyncConnectionPool(self.backend, size=pool_size, timeout=pool_timeout,
+                                        ping_interval=ping_interval)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Run a block as one transaction on one pooled connection; errors roll back and re-raise."""
+        conn = await self.pool.acquire()
+        try:
+            await self.backend.begin(conn)
+            yield AsyncTransaction(self.backend, conn, self.statements)
+            await self.backend.commit(conn)
+        except BaseException:
+            await self.backend.rollback(conn)
+            raise
+        finally:
+            await self.pool.release(conn)
+
+    async def bootstrap_schema(self, path=SCHEMA_FILE):
+        """Database.bootstrap_schema for this database; errors are raised.
+
+        The catalog checks in create_missing and the migration steps use
+        blocking cursors, so the work runs on a worker thread through a
+        synchronous Database for the same server.
+        """
+        db = Database(self.backend.sync_backend(), pool_size=1)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, db.bootstrap_schema, path)
+        finally:
+            db.close()
+
+    async def execute_query(self, query, params=None, fetch=False):
+        """Execute a query and return results if fetch is True."""
+        try:
+            async with self.transaction() as tx:
+                result = await tx.execute(query, params, fetch)
+        except self.errors as e:
+            print(f"Query error: {e}")
+            return None
+        return result.rows if fetch else result.rowcount
+
+    async def execute_statement(self, name, params=None, fetch=False):
+        """execute_query for a named registry statement."""
+        self.statements.count(name)
+        return await self.execute_query(self.statements.sql[name], params, fetch)
+
+    def mark_written(self, session):
+        """No replicas here, so every read already sees every write."""
+
+    def close(self):
+        """Close all pooled connections."""
+        self.pool.close()
+
+
+class AsyncIdentifierAllocator(IdentifierAllocator):
+    """IdentifierAllocator that leases its blocks through an AsyncDatabase."""
+
+    def __init__(self, db, block_size=1000, **kwargs):
+        super().__init__(db, block_size, **kwargs)
+        self._lock = asyncio.Lock()
+
+    async def _reserve(self, name, size):
+        async with self.db.transaction() as tx:
+            await tx.execute(self._lease_query, (name, size))
+            result = await tx.execute("SELECT next_value FROM id_blocks WHERE name = %s", (name,), fetch=True)
+            return result.rows[0]['next_value']
+
+    async def _take(self, name, count):
+        ranges = []
+        async with self._lock:
+            while count:
+                taken = self._claim(name, count)
+                if not taken:
+                    size = self._lease_size(count)
+                    self._leased(name, size, await self._reserve(name, size))
+                    continue
+                ranges.append(taken)
+                count -= len(taken)
+        return ranges
+
+    async def account_numbers(self, count):
+        return [account_number(value) for taken in await self._take('account', count) for value in taken]
+
+    async def account_number(self):
+        return (await self.account_numbers(1))[0]
+
+    async def card_numbers(self, count):
+        return self._cards(await self._take('card', count))
+
+    async def card_number(self):
+        return (await self.card_numbers(1))[0]
+
+
+class AsyncBankSystem:
+    """Asyncio variant of BankSystem with the same method surface."""
+
+    _generate_cvv = BankSystem._generate_cvv
+    _generate_pin = BankSystem._generate_pin
+    _card_row = BankSystem._card_row
+    _invalidate = BankSystem._invalidate
+    _same_transfer = staticmethod(BankSystem._same_transfer)
+
+    def __init__(self, db=None, cache=None, passwords=None, ids=None):
+        """Initialize the async database pool, the per-user read cache, password hashing and number allocation."""
+        self.db = db or AsyncDatabase()
+        self.cache = cache if cache is not None else TTLCache()
+        self.passwords = passwords or PasswordManager()
+        self.ids = ids or AsyncIdentifierAllocator(self.db)
+
+    async def _hash_password(self, password):
+        """Hash password with the configured KDF without blocking the event loop."""
+        return await asyncio.wrap_future(self.passwords.submit_hash(password))
+
+    async def _cached(self, key, load):
+        """Async read-through of the per-user cache; None results are not cached."""
+        return await self.cache.get_or_load_async(key, load)
+
+    async def register_user(self, username, password, name, address, aadhaar, mobile):
+        """Register a new user with one credit and one debit card."""
+        if await self.db.execute_statement('user_id_by_username', (username,), fetch=True):
+            print("Username already exists.")
+            return False
+
+        hashed_password = await self._hash_password(password)
+        try:
+            # Allocate numbers before taking a connection for the insert
+            account = await self.ids.account_number()
+            card_numbers = await self.ids.card_numbers(2)
+            async with self.db.transaction() as tx:
+                params = (username, hashed_password, name, address, aadhaar, mobile, account, 1000.0)
+                user_id = (await tx.run('insert_user', params)).lastrowid
+
+                await tx.run_many('insert_card', [
+                    self._card_row(user_id, card, card_type) for card, card_type in zip(card_numbers, ('Debit', 'Credit'))
+                ])
+            return True
+        except self.db.errors as e:
+            print(f"Error occurred: {e}")
+            return False
+
+    async def login(self, username, password):
+        """Authenticate user and return user_id if succesful."""
+        session_key = self.passwords.session_key(username, password)
+        user_id = self.passwords.verified.get(session_key)
+        if user_id is not None:
+            return user_id
+
+        if self.passwords.throttled(username):
+            print("Too many failed login attempts. Try again later.")
+            return None
+
+        result = await self.db.execute_statement('login', (username,), fetch=True)
+        stored = result[0]['password'] if result else None
+        ok, needs_rehash = await asyncio.wrap_future(self.passwords.submit_verify_or_dummy(stored, password))
+        if not ok:
+            self.passwords.record_failure(username)
+            return None
+
+        user_id = result[0]['user_id']
+        if needs_rehash:
+            await self.db.execute_statement('rehash_password', (await self._hash_password(password), user_id, result[0]['password']))
+        self.passwords.record_success(username)
+        self.passwords.verified.set(session_key, user_id)
+        return user_id
+
+    async def get_account_info(self, user_id):
+        """Fetch account informations."""
+        async def load():
+            result = await self.db.execute_statement('account_info', (user_id,), fetch=True)
+            if result is None:
+                return None
+            return result[0] if result else {}
+        return dict(await self._cached(('account', user_id), load) or {})
+
+    async def get_beneficiaries(self, user_id):
+        """Fetch list of beneficiaries"""
+        async def load():
+            return await self.db.execute_statement('beneficiaries', (user_id,), fetch=True)
+        return [dict(row) for row in await self._cached(('beneficiaries', user_id), load) or []]
+
+    async def get_cards(self, user_id):
+        """Fetch list of cards."""
+        async def load():
+            return await self.db.execute_statement('cards', (user_id,), fetch=True)
+        return [dict(row) for row in await self._cached(('cards', user_id), load) or []]
+
+    async def add_beneficiaries(self, user_id, name, account_number):
+        """Add a new benficiary."""
+        from validation import validate_account_number
+        if not validate_account_number(account_number) or not name.strip():
+            return False
+        try:
+            return (await self.db.execute_statement('insert_beneficiary', (user_id, name, account_number)) or 0) > 0
+        finally:
+            self._invalidate(user_id, 'beneficiaries')
+
+    async def update_account_info(self, user_id, name, address, mobile):
+        """Update account information if provided."""
+        params = [value if value.strip() else None for value in (name, address, mobile)]
+        if not any(params):
+            return False
+
+        try:
+            return (await self.db.execute_statement('update_account', params + [user_id]) or 0) > 0
+        finally:
+            self._invalidate(user_id, 'account')
+
+    async def transfer_funds(self, user_id, account_number, amount, idempotency_key=None):
+        """Transfer funds to a beneficary and record transation atomically.
+
+        Idempotency keys behave as in BankSystem.transfer_funds.
+        """
+        if amount <= 0:
+            return False
+
+        try:
+            async with self.db.transaction() as tx:
+                if idempotency_key is not None:
+                    seen = await tx.run('transaction_by_key', (user_id, idempotency_key), fetch=True)
+                    if seen.rows:
+                        return self._same_transfer(seen.rows[0], account_number, amount)
+
+                result = await tx.run('debit_balance', (amount, user_id, amount, user_id, account_number))
+                if result.rowcount != 1:
+                    return False
+
+                # The unique key makes a concurrent duplicate roll back here
+                now = datetime.now()
+                await tx.run('insert_transaction', (user_id, amount, account_number, now, idempotency_key))
+                await tx.run('daily_rollup', (now.date(), 1, amount, user_id))
+                await self._record_debits(tx, [(user_id, account_number, amount)], now)
+            return True
+        except self.db.errors as e:
+            print(f"Transfer failed: {e}")
+            return False
+        finally:
+            self._invalidate(user_id, 'account')
+
+    async def _record_debits(self, tx, debits, when):
+        """Async counterpart of BankSystem._record_debits, run inside the transfer's transaction."""
+
+    async def change_card_pin(self, user_id, card_number_last4, new_pin):
+        """Update card PIN."""
+        from validation import validate_pin
+        if not validate_pin(new_pin):
+            return False
+
+        result = await self.db.execute_statement('card_by_last4', (user_id, card_number_last4), fetch=True)
+        if not result:
+            return False
+
+        try:
+            return (await self.db.execute_statement('update_pin', (new_pin, user_id, result[0]['card_number'])) or 0) > 0
+        finally:
+            self._invalidate(user_id, 'cards')
+
+    async def add_credit_card(self, user_id):
+        """Add a new credit card."""
+        try:
+            params = self._card_row(user_id, await self.ids.card_number(), 'Credit')
+            return (await self.db.execute_statement('insert_card', params) or 0) > 0
+        except self.db.errors as e:
+            print(f"Error occurred: {e}")
+            return False
+        finally:
+            self._invalidate(user_id, 'cards')
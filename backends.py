@@ -0,0 +1,411 @@
+import itertools
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Banking_Ashutosh_Yadav.sql')
+
+
+def load_schema(path=SCHEMA_FILE):
+    """Split the schema file into individual statements."""
+    with open(path) as f:
+        text = f.read()
+    text = re.sub(r'--[^\n]*', '', text)
+    return [stmt.strip() for stmt in text.split(';') if stmt.strip()]
+
+
+def _skip_statement(statement):
+    """Statements that only make sense when run by hand against a fresh server."""
+    return re.match(r'^(CREATE\s+DATABASE|USE)\b', statement, re.IGNORECASE) is not None
+
+
+def schema_statements(backend, path=SCHEMA_FILE):
+    """Schema file statements rewritten for a backend, ready to execute."""
+    return [ddl for stmt in load_schema(path) if not _skip_statement(stmt) for ddl in backend.ddl(stmt)]
+
+
+def created_table(statement):
+    """Name of the table a CREATE TABLE statement creates, or None for other statements."""
+    match = re.match(r'^CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)', statement, re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def table_statement(table, path=SCHEMA_FILE):
+    """The schema file's CREATE TABLE statement for table."""
+    for statement in load_schema(path):
+        if created_table(statement) == table:
+            return statement
+    raise ValueError(f"{table} is not defined in {path}")
+
+
+def _if_not_exists(statement):
+    """Make CREATE TABLE statements safe to re-run."""
+    return re.sub(r'^CREATE\s+TABLE\s+(?!IF\s+NOT\s+EXISTS)', 'CREATE TABLE IF NOT EXISTS ',
+                  statement, flags=re.IGNORECASE)
+
+
+_INLINE_INDEX = re.compile(r',\s*(UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)\s*\(([^)]*)\)', re.IGNORECASE)
+
+
+class Backend:
+    """Interface every storage engine under Database implements."""
+
+    name = 'abstract'
+    errors = (Exception,)
+    max_connections = None
+
+    def connect(self):
+        """Open a new connection exposing the mysql.connector surface."""
+        raise NotImplementedError
+
+    def translate(self, query):
+        """Rewrite a %s-style query for this engine."""
+        return query
+
+    def ping(self, conn, attempts=1):
+        """Verify a pooled connection is alive, reconnecting if possible."""
+        raise NotImplementedError
+
+    def prepared_cursor(self, conn):
+        """Dictionary cursor meant to run one statement repeatedly on a connection."""
+        return conn.cursor(dictionary=True)
+
+    def session_id(self, conn):
+        """Identity of the server session behind a connection, if it can change under it."""
+        return None
+
+    def ddl(self, statement):
+        """Rewrite a DDL statement from the schema file into the statements to run on this engine."""
+        return [_if_not_exists(statement)]
+
+    def upsert_clause(self, table, keys, increment=(), replace=(), derived=False):
+        """Clause appended to an INSERT so a row whose keys already exist is updated instead.
+
+        Columns in ``increment`` are added to the stored value, columns in
+        ``replace`` overwrite it. The clause follows a VALUES list, or with
+        ``derived`` an ``INSERT ... SELECT * FROM (...) AS new WHERE true``.
+        New values are read through the ``new`` row alias, since MySQL
+        8.0.20+ warns about VALUES() in ON DUPLICATE KEY UPDATE.
+        """
+        updates = [f"{col} = {table}.{col} + new.{col}" for col in increment]
+        updates += [f"{col} = new.{col}" for col in replace]
+        return f"{'' if derived else 'AS new '}ON DUPLICATE KEY UPDATE {', '.join(updates)}"
+
+    def has_table(self, cursor, table):
+        """True if table exists in the connected database."""
+        raise NotImplementedError
+
+    def has_column(self, cursor, table, column):
+        """True if table has a column called column."""
+        raise NotImplementedError
+
+    def has_index(self, cursor, table, index):
+        """True if table has an index called index."""
+        raise NotImplementedError
+
+    def explain(self, cursor, query, params=()):
+        """The engine's plan for a query as (step, full_scan) pairs, one per plan row."""
+        raise NotImplementedError
+
+    def create_missing(self, cursor, table, ddl):
+        """Run a CREATE TABLE statement, rewritten for this engine, unless table already exists.
+
+        The catalog is checked rather than relying on IF NOT EXISTS, whose
+        "table exists" note becomes an error on MySQL under raise_on_warnings.
+        Returns True if the table was created.
+        """
+        if self.has_table(cursor, table):
+            return False
+        for statement in self.ddl(ddl):
+            cursor.execute(statement)
+        return True
+
+    def bootstrap(self, conn, path=SCHEMA_FILE):
+        """Create the schema file's missing tables, with their indexes, on a connection.
+
+        Tables that already exist are left alone, even if older than the
+        schema file; migrations.migrate brings those up to date.
+        """
+        cursor = conn.cursor(dictionary=True)
+        try:
+            for statement in load_schema(path):
+                if _skip_statement(statement):
+                    continue
+                table = created_table(statement)
+                if table:
+                    self.create_missing(cursor, table, statement)
+                    continue
+                for ddl in self.ddl(statement):
+                    cursor.execute(ddl)
+            conn.commit()
+        finally:
+            cursor.close()
+
+    def close(self):
+        """Release any resources held by the backend itself."""
+
+
+class MySQLBackend(Backend):
+    """MySQL server accessed through mysql.connector."""
+
+    name = 'mysql'
+    DEFAULT_CONFIG = {
+        'host': 'localhost',
+        'port': 3306,  # Default MySQL port
+        'user': 'root',
+        'password' : 'root@123',
+        'database' : 'Bash_db',
+        'raise_on_warnings' : True
+    }
+
+    def __init__(self, config=None):
+        import mysql.connector
+        self._connector = mysql.connector
+        self.config = config or dict(self.DEFAULT_CONFIG)
+        self.errors = (mysql.connector.Error,)
+
+    def connect(self):
+        return self._connector.connect(**self.config)
+
+    def ping(self, conn, attempts=1):
+        conn.ping(reconnect=True, attempts=attempts, delay=0)
+
+    def prepared_cursor(self, conn):
+        # Server-side prepared statement: parsed once, then only parameters are sent
+        return conn.cursor(prepared=True, dictionary=True)
+
+    def session_id(self, conn):
+        return conn.connection_id
+
+    def _catalog_count(self, cursor, query, params):
+        cursor.execute(query, params)
+        return cursor.fetchone()['n'] > 0
+
+    def has_table(self, cursor, table):
+        return self._catalog_count(cursor, """
+        SELECT COUNT(*) AS n FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = %s
+        """, (table,))
+
+    def has_column(self, cursor, table, column):
+        return self._catalog_count(cursor, """
+        SELECT COUNT(*) AS n FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (table, column))
+
+    def has_index(self, cursor, table, index):
+        return self._catalog_count(cursor, """
+        SELECT COUNT(*) AS n FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """, (table, index))
+
+    def explain(self, cursor, query, params=()):
+        cursor.execute(f"EXPLAIN {query}", params)
+        # ALL reads every row of the table, index every entry of an index
+        return [(f"{row['table']}: {row['type']} key={row['key']}", row['type'] in ('ALL', 'index'))
+                for row in cursor.fetchall()]
+
+
+class SQLiteCursor:
+    """Cursor adapter giving sqlite3 the mysql.connector cursor behaviour."""
+
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._cursor = conn.raw.cursor()
+        if dictionary:
+            self._cursor.row_factory = lambda cur, row: {
+                col[0]: value for col, value in zip(cur.description, row)
+            }
+
+    @staticmethod
+    def _adapt(params):
+        adapted = []
+        for value in params or ():
+            if isinstance(value, Decimal):
+                value = float(value)
+            elif isinstance(value, datetime):
+                value = value.isoformat(' ')
+            elif isinstance(value, date):
+                value = value.isoformat()
+            adapted.append(value)
+        return adapted
+
+    def execute(self, query, params=()):
+        self._cursor.execute(self._conn.backend.translate(query), self._adapt(params))
+
+    def executemany(self, query, seq_of_params):
+        self._cursor.executemany(
+            self._conn.backend.translate(query),
+            (self._adapt(params) for params in seq_of_params),
+        )
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Connection adapter giving sqlite3 the mysql.connector connection behaviour."""
+
+    def __init__(self, raw, backend):
+        self.raw = raw
+        self.backend = backend
+        self._open = True
+        self._isolation = raw.isolation_level
+
+    @property
+    def autocommit(self):
+        return self.raw.isolation_level is None
+
+    @autocommit.setter
+    def autocommit(self, value):
+        self.raw.isolation_level = None if value else self._isolation
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SQLiteCursor(self, dictionary=dictionary)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def is_connected(self):
+        return self._open
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        self.raw.execute('SELECT 1')
+
+    def close(self):
+        self._open = False
+        self.raw.close()
+
+
+class SQLiteBackend(Backend):
+    """Embedded SQLite engine, in memory by default, for offline runs and benchmarks."""
+
+    name = 'sqlite'
+    errors = (sqlite3.Error,)
+    _memory_ids = itertools.count()
+
+    def __init__(self, path=':memory:', timeout=30.0):
+        self.timeout = timeout
+        self._translations = {}
+        if path == ':memory:':
+            # Every connection must see the same database, so use a named
+            # shared-cache database and keep one handle open for its lifetime.
+            # Shared-cache mode uses table locks rather than busy waits, so
+            # the pool is limited to one connection at a time.
+            self.path = f'file:bank_{os.getpid()}_{next(self._memory_ids)}?mode=memory&cache=shared'
+            self.max_connections = 1
+            self._keeper = sqlite3.connect(self.path, uri=True, check_same_thread=False)
+        else:
+            self.path = path
+            self._keeper = None
+
+    def connect(self):
+        raw = sqlite3.connect(
+            self.path,
+            uri=self._keeper is not None,
+            timeout=self.timeout,
+            check_same_thread=False,
+            isolation_level='IMMEDIATE',
+        )
+        raw.execute('PRAGMA foreign_keys = ON')
+        if self._keeper is None:
+            raw.execute('PRAGMA journal_mode = WAL')
+        return SQLiteConnection(raw, self)
+
+    def translate(self, query):
+        translated = self._translations.get(query)
+        if translated is None:
+            translated = re.sub(r'\s+FOR\s+UPDATE\b', '', query, flags=re.IGNORECASE)
+            translated = translated.replace('%s', '?').replace('%%', '%')
+            self._translations[query] = translated
+        return translated
+
+    def ping(self, conn, attempts=1):
+        conn.ping()
+
+    def upsert_clause(self, table, keys, increment=(), replace=(), derived=False):
+        updates = [f"{col} = {col} + excluded.{col}" for col in increment]
+        updates += [f"{col} = excluded.{col}" for col in replace]
+        return f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {', '.join(updates)}"
+
+    def ddl(self, statement):
+        statement = _if_not_exists(statement)
+        # SQLite has no inline INDEX clauses, so lift them into CREATE INDEX statements
+        table = re.match(r'^CREATE\s+TABLE\s+IF\s+NOT\s+EXISTS\s+(\w+)', statement, re.IGNORECASE)
+        indexes = []
+        if table:
+            for unique, name, columns in _INLINE_INDEX.findall(statement):
+                indexes.append(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} "
+                               f"ON {table.group(1)} ({columns})")
+            statement = _INLINE_INDEX.sub('', statement)
+        statement = re.sub(
+            r'\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b',
+            'INTEGER PRIMARY KEY AUTOINCREMENT',
+            statement,
+            flags=re.IGNORECASE,
+        )
+        statement = re.sub(
+            r'(\w+)\s+ENUM\s*\(([^)]*)\)',
+            r'\1 TEXT CHECK (\1 IN (\2))',
+            statement,
+            flags=re.IGNORECASE,
+        )
+        return [statement] + indexes
+
+    def _catalog_count(self, cursor, query, params):
+        cursor.execute(query, params)
+        return cursor.fetchone()['n'] > 0
+
+    def has_table(self, cursor, table):
+        return self._catalog_count(
+            cursor, "SELECT COUNT(*) AS n FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+
+    def has_column(self, cursor, table, column):
+        return self._catalog_count(
+            cursor, "SELECT COUNT(*) AS n FROM pragma_table_info(%s) WHERE name = %s", (table, column))
+
+    def has_index(self, cursor, table, index):
+        return self._catalog_count(
+            cursor, "SELECT COUNT(*) AS n FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name = %s",
+            (table, index))
+
+    def explain(self, cursor, query, params=()):
+        cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+        # SEARCH steps seek through an index; SCAN steps read a whole table or index
+        return [(row['detail'], row['detail'].startswith('SCAN ')) for row in cursor.fetchall()]
+
+    def close(self):
+        """Drop the in-memory database once the last handle goes away."""
+        if self._keeper is not None:
+            self._keeper.close()
+            self._keeper = None
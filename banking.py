@@ -1,173 +1,476 @@
 from database import Database
-import random
-import string
-import hashlib
+from cache import TTLCache
+from passwords import PasswordManager
+from identifiers import IdentifierAllocator, random_digits
+import base64
+import itertools
+from collections import namedtuple
 from datetime import datetime
+from decimal import Decimal
+
+# Outcome of one row of BankSystem.transfer_funds_bulk; reason is None on success.
+TransferResult = namedtuple('TransferResult', ['user_id', 'account_number', 'amount', 'ok', 'reason'])
+
+# Outcome of one row of BankSystem.register_users_bulk; reason is None on success.
+RegistrationResult = namedtuple('RegistrationResult', ['username', 'ok', 'reason'])
 
 class BankSystem:
     """Main Class to handle Banking Operations."""
 
-    def __init__(self):
-        """Initialize database connection."""
-        self.db = Database()
+    def __init__(self, db=None, cache=None, passwords=None, ids=None):
+        """Initialize database connection, the per-user read cache, password hashing and number allocation."""
+        self.db = db or Database()
+        self.cache = cache if cache is not None else TTLCache()
+        self.passwords = passwords or PasswordManager()
+        self.ids = ids or IdentifierAllocator(self.db)
+
+    def _invalidate(self, user_id, *kinds):
+        """Drop cached reads for a user after a write touches them, and keep their reads on the primary."""
+        self.cache.invalidate(*((kind, user_id) for kind in kinds))
+        self.db.mark_written(user_id)
 
     def _hash_password(self, password):
-        """Hash password using SHA-256."""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Hash password with the configured salted KDF."""
+        return self.passwords.hash(password)
     
     def _generate_card_number(self):
-        """Generate a 16 digit Card Number."""
-        return ''.join(random.choices(string.digits, k=16))
+        """Allocate a unique, Luhn-valid 16 digit Card Number."""
+        return self.ids.card_number()
     
     def _generate_cvv(self):
         """Generate a 3 digit CVV."""
-        return ''.join(random.choices(string.digits, k=3))
+        return random_digits(3)
     
     def _generate_pin(self):
         """Generate a 4 digit PIN."""
-        return ''.join(random.choices(string.digits, k=4))
+        return random_digits(4)
     
+    def _card_row(self, user_id, card_number, card_type):
+        """Values for one cards row, with a fresh PIN and CVV, in insert_card order."""
+        return (user_id, card_number, card_number[-4:], card_type, self._generate_pin(), self._generate_cvv())
+
     def _generate_account_number(self):
-        """Generate a 10 digit Account Number"""
-        return ''.join(random.choices(string.digits, k=10))
+        """Allocate a unique 10 digit Account Number"""
+        return self.ids.account_number()
     
     def register_user(self, username, password, name, address, aadhaar, mobile):
         """Register a new user with one credit and one debit card."""
         # Check if username exists
-        query = "SELECT user_id FROM users WHERE username = %s"
-        if self.db.execute_query(query, (username,), fetch=True):
+        if self.db.execute_statement('user_id_by_username', (username,), fetch=True):
             print("Username already exists.")
             return False
         
         # Hash Password
         hashed_password = self._hash_password(password)
 
-        # Generate Account Number
-        account_number = self._generate_account_number()
-
-        # Use a single connection
-        with self.db.get_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            try:
-                # Start transaction
-                conn.autocommit = False
+        # Allocate the account and card numbers before taking a connection for the insert
+        try:
+            account_number = self._generate_account_number()
+            debit_card, credit_card = self.ids.card_numbers(2)
+        except self.db.errors as e:
+            print(f"Error occurred: {e}")
+            return False
 
+        # Insert the user and both cards in one transaction on a single connection
+        try:
+            with self.db.transaction():
                 # Insert User
-                query = """
-                INSERT INTO users (username, password, name, address, aadhaar, mobile, account_number, balance)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """
+                insert_user = self.db.statement('insert_user')
                 params = (username, hashed_password, name, address, aadhaar, mobile, account_number, 1000.0)
-                cursor.execute(query, params)
-                user_id = cursor.lastrowid  # Get inserted ID directly
-
-                if not user_id:
-                    conn.rollback()
-                    return False
+                insert_user.execute(params)
+                user_id = insert_user.lastrowid  # Get inserted ID directly
 
                 # Add a debit card
-                query = """
-                INSERT INTO cards (user_id, card_number, card_type, pin, cvv)
-                VALUES (%s, %s, %s, %s, %s)
-                """
-                cursor.execute(query, (user_id, self._generate_card_number(), 'Debit', self._generate_pin(), self._generate_cvv()))
+                insert_card = self.db.statement('insert_card')
+                insert_card.execute(self._card_row(user_id, debit_card, 'Debit'))
 
                 # Add a credit card
-                cursor.execute(query, (user_id, self._generate_card_number(), 'Credit', self._generate_pin(), self._generate_cvv()))
+                insert_card.execute(self._card_row(user_id, credit_card, 'Credit'))
+            # Log in against the primary until replicas have the new user
+            self.db.mark_written(username)
+            return True
+
+        except self.db.errors as e:
+            print(f"Error occurred: {e}")
+            return False
+
+    def register_users_bulk(self, rows, chunk_size=1000, retries=3):
+        """Register many users, one transaction per chunk, yielding a RegistrationResult per row.
+
+        ``rows`` is any iterable of dicts with the registration fields and is
+        consumed lazily; each user gets one debit and one credit card. A chunk
+        that hits a database error is tried up to ``retries`` times in all.
+        """
+        if retries < 1:
+            raise ValueError("retries must be at least 1")
+        from validation import validate_registrations
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            results = [None] * len(chunk)
+            accepted = {}
+            for i, error in enumerate(validate_registrations(chunk)):
+                username = chunk[i].get('username') if isinstance(chunk[i], dict) else None
+                if error:
+                    results[i] = RegistrationResult(username, False, error)
+                elif username in accepted:
+                    results[i] = RegistrationResult(username, False, 'Duplicate username in batch.')
+                else:
+                    accepted[username] = i
+
+            for attempt in range(retries):
+                try:
+                    taken = self._register_chunk([chunk[i] for i in accepted.values()])
+                    break
+                except self.db.errors as e:
+                    # Most likely a lock timeout, or a number issued before the allocator existed; retry with fresh numbers
+                    last_error = e
+            else:
+                print(f"Bulk registration chunk failed: {last_error}")
+                taken = None
+
+            for username, i in accepted.items():
+                if taken is None:
+                    results[i] = RegistrationResult(username, False, 'database error')
+                elif username in taken:
+                    results[i] = RegistrationResult(username, False, 'Username already exists.')
+                else:
+                    results[i] = RegistrationResult(username, True, None)
+            yield from results
+
+    def _register_chunk(self, rows):
+        """Insert one chunk of validated users and their cards, returning usernames that already existed."""
+        if not rows:
+            return set()
+
+        # Hash outside the transaction, skipping users we already know exist
+        usernames = [row['username'] for row in rows]
+        placeholders = ', '.join(['%s'] * len(usernames))
+        existing = self.db.execute_query(f"SELECT username FROM users WHERE username IN ({placeholders})", usernames, fetch=True)
+        existing = {row['username'] for row in existing or []}
+        rows = [row for row in rows if row['username'] not in existing]
+        if not rows:
+            return existing
+        hashes = dict(zip((row['username'] for row in rows), self.passwords.hash_many([row['password'] for row in rows])))
+        account_numbers = self.ids.account_numbers(len(rows))
+        card_numbers = iter(self.ids.card_numbers(2 * len(rows)))
+
+        with self.db.transaction() as cursor:
+            usernames = [row['username'] for row in rows]
+            placeholders = ', '.join(['%s'] * len(usernames))
+            cursor.execute(f"SELECT username FROM users WHERE username IN ({placeholders})", usernames)
+            taken = {row['username'] for row in cursor.fetchall()}
+            rows = [row for row in rows if row['username'] not in taken]
+            if not rows:
+                return taken | existing
+
+            values = []
+            for row, account_number in zip(rows, account_numbers):
+                values.extend((row['username'], hashes[row['username']], row['name'], row['address'],
+                               row['aadhaar'], row['mobile'], account_number, 1000.0))
+            query = f"""
+            INSERT INTO users (username, password, name, address, aadhaar, mobile, account_number, balance)
+            VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(rows))}
+            """
+            cursor.execute(query, values)
+
+            inserted = [row['username'] for row in rows]
+            placeholders = ', '.join(['%s'] * len(inserted))
+            cursor.execute(f"SELECT user_id FROM users WHERE username IN ({placeholders})", inserted)
+            user_ids = [row['user_id'] for row in cursor.fetchall()]
+
+            values = []
+            for user_id in user_ids:
+                for card_type in ('Debit', 'Credit'):
+                    values.extend(self._card_row(user_id, next(card_numbers), card_type))
+            query = f"""
+            INSERT INTO cards (user_id, card_number, card_last4, card_type, pin, cvv)
+            VALUES {', '.join(['(%s, %s, %s, %s, %s, %s)'] * (2 * len(user_ids)))}
+            """
+            cursor.execute(query, values)
+        for row in rows:
+            self.db.mark_written(row['username'])
+        return taken | existing
 
-                # Commit transaction
-                conn.commit()
-                return True
-        
-            except Exception as e:
-                # Rollback
-                conn.rollback()
-                print(f"Error occurred: {e}")
-                return False
-            finally:
-                cursor.close()
-        
     def login(self, username, password) :
         """Authenticate user and return user_id if succesful."""
 
-        hashed_password = self._hash_password(password)
-        query = "SELECT user_id FROM users WHERE username = %s AND password = %s"
-        result = self.db.execute_query(query, (username, hashed_password), fetch=True )
-        return result[0]['user_id'] if result else None
+        session_key = self.passwords.session_key(username, password)
+        user_id = self.passwords.verified.get(session_key)
+        if user_id is not None:
+            return user_id
+
+        if self.passwords.throttled(username):
+            print("Too many failed login attempts. Try again later.")
+            return None
+
+        result = self.db.execute_read('login', (username,), session=username)
+        stored = result[0]['password'] if result else None
+        ok, needs_rehash = self.passwords.verify_or_dummy(stored, password)
+        if not ok:
+            self.passwords.record_failure(username)
+            return None
+
+        user_id = result[0]['user_id']
+        if needs_rehash:
+            # Upgrade legacy SHA-256 rows (or outdated KDF costs) now that we know the password
+            self.db.execute_statement('rehash_password', (self._hash_password(password), user_id, result[0]['password']))
+        self.passwords.record_success(username)
+        self.passwords.verified.set(session_key, user_id)
+        return user_id
     
     def get_account_info(self, user_id) :
         """Fetch account informations."""
-        query = "SELECT name, address, aadhaar, mobile, balance FROM users WHERE user_id = %s"
-        result = self.db.execute_query(query, (user_id,), fetch=True)
-        return result[0] if result else {}
+        def load():
+            result = self.db.execute_read('account_info', (user_id,), session=user_id)
+            if result is None:
+                return None
+            return result[0] if result else {}
+        return dict(self.cache.get_or_load(('account', user_id), load) or {})
     
     def get_beneficiaries(self, user_id) :
         """Fetch list of beneficiaries"""
-        query = "SELECT name, account_number FROM beneficiaries WHERE user_id = %s"
-        return self.db.execute_query(query, (user_id,), fetch =True) or []
+        def load():
+            return self.db.execute_read('beneficiaries', (user_id,), session=user_id)
+        return [dict(row) for row in self.cache.get_or_load(('beneficiaries', user_id), load) or []]
 
     def get_cards(self, user_id):
         """Fetch list of cards."""
-        query = "SELECT card_number, card_type, pin, cvv FROM cards WHERE user_id = %s"
-        return self.db.execute_query(query, (user_id,), fetch = True) or []
+        def load():
+            return self.db.execute_read('cards', (user_id,), session=user_id)
+        return [dict(row) for row in self.cache.get_or_load(('cards', user_id), load) or []]
 
     def add_beneficiaries(self, user_id, name, account_number):
         """Add a new benficiary."""
         from validation import validate_account_number
         if not validate_account_number(account_number) or not name.strip():
             return False
-        query = "INSERT INTO beneficiaries (user_id, name, account_number) VALUES (%s, %s, %s)"
-        return self.db.execute_query(query, (user_id, name, account_number)) > 0
+        try:
+            return (self.db.execute_statement('insert_beneficiary', (user_id, name, account_number)) or 0) > 0
+        finally:
+            self._invalidate(user_id, 'beneficiaries')
     
     def update_account_info(self, user_id, name, address, mobile):
         """Update account information if provided."""
-        updates = {}
-        if name.strip():
-            updates['name'] = name
-        
-        if address.strip():
-            updates['address'] = address
+        # Blank fields are passed as NULL and left unchanged
+        params = [value if value.strip() else None for value in (name, address, mobile)]
+        if not any(params):
+            return False
 
-        if mobile.strip():
-            updates['mobile'] = address
+        try:
+            return (self.db.execute_statement('update_account', params + [user_id]) or 0) > 0
+        finally:
+            self._invalidate(user_id, 'account')
+    
+    def transfer_funds(self, user_id, account_number, amount, idempotency_key=None):
+        """Transfer funds to a beneficary and record transation atomically.
 
-        if not updates:
+        A transfer carrying an idempotency_key that the same payer already used
+        is not applied again. It reports success if the earlier transfer went
+        to the same beneficiary for the same amount, so callers can safely
+        retry, and failure otherwise. Keys are scoped per payer.
+        """
+        try:
+            return self._apply_transfer(user_id, account_number, amount, idempotency_key)
+        except self.db.errors as e:
+            print(f"Transfer failed: {e}")
             return False
-        
-        query_parts = [f"{k} = %s" for k in updates]
-        query = f"UPDATE users SET {', '.join(query_parts)} WHERE user_id = %s"
-        params = list(updates.values()) + [user_id]
-        return self.db.execute_query(query, params) > 0
-    
-    def transfer_funds(self, user_id, account_number, amount):
-        """Transfer funds to a beneficary and record transation."""
+
+    def _apply_transfer(self, user_id, account_number, amount, idempotency_key=None, payees=None):
+        """transfer_funds without the error handling: database errors propagate for callers that retry.
+
+        ``payees`` is handed on to _record_debits.
+        """
         if amount <= 0:
             return False
-        
-        #Check Balance
-        info = self.get_account_info(user_id)
-        if info['balance'] < amount:
-            return False
-        
-        #Verify beneficiary
-        query = "SELECT id FROM beneficiaries WHERE user_id = %s AND account_number = %s"
-        if not self.db.execute_query(query, (user_id, account_number), fetch = True):
-            return False
-        
-        # Record transaction first
-        query = """
-        INSERT INTO transactions (user_id, amount, beneficiary_account, transaction_date)
-        VALUES (%s, %s, %s, %s)
+
+        try:
+            with self.db.transaction():
+                if idempotency_key is not None:
+                    seen = self.db.statement('transaction_by_key')
+                    seen.execute((user_id, idempotency_key))
+                    row = seen.fetchone()
+                    if row:
+                        return self._same_transfer(row, account_number, amount)
+
+                # Debit only if the beneficiary exists and the balance covers the
+                # amount; the row lock taken by the UPDATE serializes concurrent
+                # transfers from the same account, so it can never be overdrawn.
+                debit = self.db.statement('debit_balance')
+                debit.execute((amount, user_id, amount, user_id, account_number))
+                if debit.rowcount != 1:
+                    return False
+
+                # The unique key makes a concurrent duplicate roll back here
+                now = datetime.now()
+                self.db.statement('insert_transaction').execute((user_id, amount, account_number, now, idempotency_key))
+                self.db.statement('daily_rollup').execute((now.date(), 1, amount, user_id))
+                self._record_debits([(user_id, account_number, amount)], now, payees)
+            return True
+        finally:
+            self._invalidate(user_id, 'account')
+
+    @staticmethod
+    def _same_transfer(row, account_number, amount):
+        """True if a transaction row found by idempotency key is this transfer, not another that reused its key."""
+        return row['beneficiary_account'] == account_number and Decimal(str(row['amount'])) == Decimal(str(amount))
+
+    def _record_debits(self, debits, when, payees=None):
+        """Hook run inside a transfer's transaction with its applied (user_id, account_number, amount) rows.
+
+        ``payees`` is anything the caller looked up about the beneficiaries
+        before the transaction took its row locks.
         """
-        transaction_success = self.db.execute_query(query, (user_id, amount, account_number, datetime.now()))
-        
-        # If transaction was recorded successfully, update the balance
-        if transaction_success:
-            query = "UPDATE users SET balance = balance - %s WHERE user_id = %s"
-            return self.db.execute_query(query, (amount, user_id)) > 0
-    
-        # If transaction failed, don't subtract the amount
-        return False
+
+    def transfer_funds_bulk(self, batch, chunk_size=1000):
+        """Apply many transfers, one transaction per chunk, yielding a TransferResult per row.
+
+        ``batch`` is any iterable of (user_id, account_number, amount) tuples and
+        is consumed lazily, so large payroll files stream through in constant memory.
+        """
+        rows = iter(batch)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield from self._transfer_chunk(chunk)
+
+    def _transfer_chunk(self, chunk, payees=None):
+        """Validate and apply one chunk of bulk transfers in a single transaction; payees goes to _record_debits."""
+        results = [None] * len(chunk)
+        pending = []
+        for i, (user_id, account_number, amount) in enumerate(chunk):
+            if amount <= 0:
+                results[i] = TransferResult(user_id, account_number, amount, False, 'invalid amount')
+            else:
+                pending.append(i)
+        if not pending:
+            return results
+
+        pairs = sorted({(chunk[i][0], chunk[i][1]) for i in pending})
+        user_ids = sorted({user_id for user_id, _ in pairs})
+        try:
+            with self.db.transaction() as cursor:
+                # Verify every beneficiary with one set-based query
+                placeholders = ', '.join(['(%s, %s)'] * len(pairs))
+                query = f"SELECT DISTINCT user_id, account_number FROM beneficiaries WHERE (user_id, account_number) IN ({placeholders})"
+                cursor.execute(query, [value for pair in pairs for value in pair])
+                known = {(row['user_id'], row['account_number']) for row in cursor.fetchall()}
+
+                # Lock the paying accounts and apply the rows in order against running balances
+                placeholders = ', '.join(['%s'] * len(user_ids))
+                query = f"SELECT user_id, balance FROM users WHERE user_id IN ({placeholders}) FOR UPDATE"
+                cursor.execute(query, user_ids)
+                balances = {row['user_id']: Decimal(str(row['balance'])) for row in cursor.fetchall()}
+
+                now = datetime.now()
+                ledger, debits, counts, accepted = [], {}, {}, []
+                for i in pending:
+                    user_id, account_number, amount = chunk[i]
+                    value = Decimal(str(amount))
+                    if (user_id, account_number) not in known:
+                        results[i] = TransferResult(user_id, account_number, amount, False, 'unknown beneficiary')
+                    elif balances.get(user_id, 0) < value:
+                        results[i] = TransferResult(user_id, account_number, amount, False, 'insufficient funds')
+                    else:
+                        balances[user_id] -= value
+                        debits[user_id] = debits.get(user_id, 0) + value
+                        counts[user_id] = counts.get(user_id, 0) + 1
+                        ledger.append((user_id, amount, account_number, now, None))
+                        accepted.append(i)
+
+                if ledger:
+                    # Plain cursor executemany so the driver can batch the rows
+                    sql = self.db.statements.sql
+                    cursor.executemany(sql['insert_transaction'], ledger)
+                    cursor.executemany(sql['debit_balance_unchecked'], [(total, user_id) for user_id, total in debits.items()])
+                    cursor.executemany(sql['daily_rollup'], [
+                        (now.date(), counts[user_id], total, user_id) for user_id, total in debits.items()
+                    ])
+                    self._record_debits([(user_id, account_number, amount) for user_id, amount, account_number, _, _ in ledger], now, payees)
+
+        except self.db.errors as e:
+            print(f"Bulk transfer chunk failed: {e}")
+            for user_id in user_ids:
+                self._invalidate(user_id, 'account')
+            for i in pending:
+                user_id, account_number, amount = chunk[i]
+                results[i] = TransferResult(user_id, account_number, amount, False, 'database error')
+            return results
+
+        for user_id in user_ids:
+            self._invalidate(user_id, 'account')
+        for i in accepted:
+            user_id, account_number, amount = chunk[i]
+            results[i] = TransferResult(user_id, account_number, amount, True, None)
+        return results
+
+    def get_transactions(self, user_id, since=None, until=None, limit=50, cursor=None):
+        """Fetch one page of transaction history, newest first.
+
+        Returns (rows, next_cursor); pass next_cursor back to get the following
+        page, or stop when it is None. Pages are found by keyset on the
+        (user_id, transaction_date, transaction_id) index, so deep pages cost
+        the same as the first. Database errors are raised, so a failed read is
+        never mistaken for an empty history.
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        conditions, params = self._transaction_filters(user_id, since, until)
+        if cursor:
+            last_date, last_id = self._decode_cursor(cursor)
+            conditions.append("(transaction_date < %s OR (transaction_date = %s AND transaction_id < %s))")
+            params.extend([last_date, last_date, last_id])
+
+        query = f"""
+        SELECT transaction_id, amount, beneficiary_account, transaction_date FROM transactions
+        WHERE {' AND '.join(conditions)}
+        ORDER BY transaction_date DESC, transaction_id DESC
+        LIMIT %s
+        """
+        with self.db.transaction() as db_cursor:
+            db_cursor.execute(query, params + [limit + 1])
+            rows = db_cursor.fetchall()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, self._encode_cursor(rows[-1])
+
+    def stream_transactions(self, user_id, since=None, until=None, batch_size=500):
+        """Yield a user's whole transaction history, oldest first, in constant memory."""
+        conditions, params = self._transaction_filters(user_id, since, until)
+        query = f"""
+        SELECT transaction_id, amount, beneficiary_account, transaction_date FROM transactions
+        WHERE {' AND '.join(conditions)}
+        ORDER BY transaction_date, transaction_id
+        """
+        return self.db.stream_query(query, params, batch_size=batch_size)
+
+    def _transaction_filters(self, user_id, since, until):
+        """WHERE conditions and params shared by the history queries."""
+        conditions, params = ["user_id = %s"], [user_id]
+        if since is not None:
+            conditions.append("transaction_date >= %s")
+            params.append(since)
+        if until is not None:
+            conditions.append("transaction_date < %s")
+            params.append(until)
+        return conditions, params
+
+    @staticmethod
+    def _encode_cursor(row):
+        """Opaque page cursor pointing just past a row."""
+        date = row['transaction_date']
+        date = date.isoformat(' ') if isinstance(date, datetime) else str(date)
+        return base64.urlsafe_b64encode(f"{date}|{row['transaction_id']}".encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        """Inverse of _encode_cursor."""
+        date, _, transaction_id = base64.urlsafe_b64decode(cursor.encode()).decode().rpartition('|')
+        return datetime.fromisoformat(date), int(transaction_id)
 
     def change_card_pin(self, user_id, card_number_last4, new_pin):
         """Update card PIN."""
@@ -175,20 +478,23 @@ class BankSystem:
         if not validate_pin(new_pin):
             return False
         
-        query = "SELECT card_number FROM cards WHERE user_id = %s AND card_number LIKE %s"
-        result = self.db.execute_query(query, (user_id, f'%{card_number_last4}'), fetch = True)
+        result = self.db.execute_statement('card_by_last4', (user_id, card_number_last4), fetch=True)
         if not result:
             return False
         
-        query = "Update cards SET pin = %s WHERE user_id = %s AND card_number = %s"
-        return self.db.execute_query(query, (new_pin, user_id, result[0]['card_number'])) > 0
+        try:
+            return (self.db.execute_statement('update_pin', (new_pin, user_id, result[0]['card_number'])) or 0) > 0
+        finally:
+            self._invalidate(user_id, 'cards')
     
     def add_credit_card(self, user_id):
         """Add a new credit card."""
 
-        query = """
-        INSERT INTO cards (user_id, card_number, card_type, pin, cvv)
-        VALUES (%s, %s, %s, %s, %s)
-        """
-        return self.db.execute_query(query, (user_id, self._generate_card_number(), 'Credit', self._generate_pin(), self._generate_cvv())) > 0
+        try:
+            return (self.db.execute_statement('insert_card', self._card_row(user_id, self._generate_card_number(), 'Credit')) or 0) > 0
+        except self.db.errors as e:
+            print(f"Error occurred: {e}")
+            return False
+        finally:
+            self._invalidate(user_id, 'cards')
     
\ No newline at end of file
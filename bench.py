@@ -0,0 +1,469 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import string
+import sys
+import tempfile
+import threading
+import time
+from backends import SQLiteBackend
+from array import array
+from banking import BankSystem
+from database import Database
+from identifiers import IdentifierAllocator
+from instrumentation import QueryStats, summarize
+from validation import REGISTRATION, REGISTRATION_FIELDS, registration_error
+from passwords import PasswordManager, ScryptHasher
+
+DEFAULT_MIX = {
+    'account_info': 40,
+    'transfer': 20,
+    'login': 15,
+    'login_warm': 5,
+    'change_pin': 10,
+    'register': 5,
+    'add_card': 5,
+}
+
+PASSWORD = 'benchpass'
+BENEFICIARY = '9999999999'
+
+def eval_power(text):
+    """Parse an integer written plainly or as base**exponent."""
+
+    base, _, exponent = text.strip().partition('**')
+    return int(base) ** int(exponent) if exponent else int(base)
+
+def parse_mix(text):
+    """Parse 'op=weight,op=weight' into a dict of weights."""
+
+    mix = {}
+    for part in text.split(','):
+        op, _, weight = part.partition('=')
+        if op.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown operation {op!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[op.strip()] = float(weight or 1)
+    return mix
+
+def make_bank(backend, path=None, pool_size=8, instrument=None, passwords=None):
+    """Build a BankSystem on the requested backend with the schema in place."""
+
+    if backend == 'sqlite':
+        db = Database(SQLiteBackend(path or ':memory:'), pool_size=pool_size, instrument=instrument)
+        db.bootstrap_schema()
+    else:
+        db = Database(pool_size=pool_size, instrument=instrument)
+    return BankSystem(db, passwords=passwords)
+
+def seed_users(bank, count, prefix='bench'):
+    """Register benchmark users, give each a beneficiary, and return their ids and card suffixes."""
+
+    rows = ({
+        'username': f'{prefix}{i}', 'password': PASSWORD, 'name': f'Bench User {i}',
+        'address': 'Bench Street', 'aadhaar': '123456789012', 'mobile': '9876543210',
+    } for i in range(count))
+    for _ in bank.register_users_bulk(rows):
+        pass
+
+    users = []
+    for i in range(count):
+        user_id = bank.login(f'{prefix}{i}', PASSWORD)
+        if not any(b['account_number'] == BENEFICIARY for b in bank.get_beneficiaries(user_id)):
+            bank.add_beneficiaries(user_id, 'Bench Payee', BENEFICIARY)
+        # Plenty of balance so transfers measure the write path, not rejections
+        bank.db.execute_query("UPDATE users SET balance = %s WHERE user_id = %s", (10000000.0, user_id))
+        users.append({
+            'username': f'{prefix}{i}',
+            'user_id': user_id,
+            'card_last4': bank.get_cards(user_id)[0]['card_number'][-4:],
+        })
+    # Seeding logged everyone in, which leaves the verified-login cache warm for login_warm
+    bank.cache.clear()
+    return users
+
+def _operations(bank, users, rng, worker_id):
+    """Build the callables each worker drives; each returns truthy on success."""
+
+    counter = iter(range(10 ** 9))
+
+    def register():
+        name = f'w{worker_id}n{next(counter)}{rng.randrange(10 ** 6)}'[:20]
+        return bank.register_user(name, PASSWORD, 'Load Test', 'Bench Street', '123456789012', '9876543210')
+
+    def login():
+        # Cold: forget any cached verification so every login runs the KDF
+        username = rng.choice(users)['username']
+        bank.passwords.verified.invalidate(bank.passwords.session_key(username, PASSWORD))
+        return bank.login(username, PASSWORD)
+
+    def login_warm():
+        return bank.login(rng.choice(users)['username'], PASSWORD)
+
+    def account_info():
+        return bank.get_account_info(rng.choice(users)['user_id'])
+
+    def transfer():
+        return bank.transfer_funds(rng.choice(users)['user_id'], BENEFICIARY, 0.01)
+
+    def change_pin():
+        user = rng.choice(users)
+        return bank.change_card_pin(user['user_id'], user['card_last4'], f'{rng.randrange(10000):04d}')
+
+    def add_card():
+        return bank.add_credit_card(rng.choice(users)['user_id'])
+
+    return {
+        'register': register, 'login': login, 'login_warm': login_warm, 'account_info': account_info,
+        'transfer': transfer, 'change_pin': change_pin, 'add_card': add_card,
+    }
+
+def run_benchmark(bank, users, mix=None, concurrency=4, duration=10.0, seed=0):
+    """Drive the operation mix from several threads and return a report dict."""
+
+    mix = {op: weight for op, weight in (mix or DEFAULT_MIX).items() if weight > 0}
+    ops, weights = list(mix), list(mix.values())
+    samples = [{op: [] for op in ops} for _ in range(concurrency)]
+    failures = [{op: 0 for op in ops} for _ in range(concurrency)]
+    start_barrier = threading.Barrier(concurrency + 1)
+    deadline = [0.0]
+
+    def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        operations = _operations(bank, users, rng, worker_id)
+        start_barrier.wait()
+        while time.perf_counter() < deadline[0]:
+            op = rng.choices(ops, weights)[0]
+            began = time.perf_counter()
+            try:
+                ok = operations[op]()
+            except Exception:
+                ok = False
+            samples[worker_id][op].append(time.perf_counter() - began)
+            if not ok:
+                failures[worker_id][op] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + duration
+    started = time.perf_counter()
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    report = {'operations': {}}
+    total = 0
+    for op in ops:
+        latencies = [s for worker_samples in samples for s in worker_samples[op]]
+        total += len(latencies)
+        report['operations'][op] = summarize(latencies, sum(f[op] for f in failures), elapsed)
+    report['total'] = {'count': total, 'throughput': round(total / elapsed, 2), 'seconds': round(elapsed, 3)}
+    report['pool'] = bank.db.pool.snapshot()
+    report['cache'] = bank.cache.snapshot()
+    return report
+
+def compare_reports(baseline, current, tolerance=0.10):
+    """List operations whose throughput fell or p95 latency rose by more than tolerance."""
+
+    regressions = []
+    for op, now in current['operations'].items():
+        before = baseline.get('operations', {}).get(op)
+        if not before or not before['count']:
+            continue
+        if now['throughput'] < before['throughput'] * (1 - tolerance):
+            regressions.append(f"{op}: throughput {before['throughput']} -> {now['throughput']} ops/sec")
+        if now['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{op}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+    return regressions
+
+def print_report(report):
+    """Print a human-readable table of a report."""
+
+    width = max([14] + [len(op) + 2 for op in report['operations']])
+    print(f"{'operation':<{width}}{'count':>8}{'fail':>6}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for op, stats in report['operations'].items():
+        print(f"{op:<{width}}{stats['count']:>8}{stats['failures']:>6}{stats['throughput']:>10.1f}"
+              f"{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+    total = report.get('total')
+    if total:
+        print(f"{'total':<{width}}{total['count']:>8}{'':>6}{total['throughput']:>10.1f}")
+
+def cmd_ops(args):
+    """Run the banking operation mix and report throughput and latency."""
+
+    path = args.db
+    if args.backend == 'sqlite' and path is None:
+        # A file database lets every pooled connection work concurrently
+        path = os.path.join(tempfile.mkdtemp(prefix='bankbench'), 'bench.db')
+    passwords = PasswordManager(ScryptHasher(n=args.scrypt_n))
+    bank = make_bank(args.backend, path, pool_size=args.pool_size, passwords=passwords)
+    users = seed_users(bank, args.users)
+    if args.query_stats:
+        # Attach after seeding so only the measured run is recorded
+        bank.db.instrument = QueryStats(slow_query_threshold=float('inf'))
+    report = run_benchmark(bank, users, args.mix, args.concurrency, args.duration, args.seed)
+    if args.query_stats:
+        report['queries'] = bank.db.instrument.snapshot()
+        report['statements'] = bank.db.statements.snapshot()
+    report['config'] = {
+        'backend': args.backend, 'db': path, 'concurrency': args.concurrency, 'duration': args.duration,
+        'users': args.users, 'pool_size': args.pool_size, 'scrypt_n': args.scrypt_n,
+        'mix': args.mix or DEFAULT_MIX, 'seed': args.seed,
+        'python': platform.python_version(), 'platform': platform.platform(),
+    }
+    bank.db.close()
+    passwords.close()
+    return report
+
+def _allocate_ids(job):
+    """Allocate one worker's share of identifiers, returning them packed as integers plus batch timings."""
+
+    path, kind, count, batch_size, block_size = job
+    db = Database(SQLiteBackend(path), pool_size=1)
+    allocator = IdentifierAllocator(db, block_size=block_size)
+    generators = {
+        'account': allocator.account_numbers,
+        'card': allocator.card_numbers,
+        # What the bank did before the allocator, for comparison
+        'random_account': lambda n: [''.join(random.choices(string.digits, k=10)) for _ in range(n)],
+        'random_card': lambda n: [''.join(random.choices(string.digits, k=16)) for _ in range(n)],
+    }
+    allocate = generators[kind]
+    values, timings = array('Q'), []
+    while count:
+        n = min(batch_size, count)
+        began = time.perf_counter()
+        numbers = allocate(n)
+        timings.append(time.perf_counter() - began)
+        values.extend(map(int, numbers))
+        count -= n
+    db.close()
+    return values.tobytes(), timings, allocator.leases
+
+def count_duplicates(values):
+    """Count values in an array('Q') that repeat an earlier one, by sorting."""
+
+    try:
+        import numpy as np
+    except ImportError:
+        ordered = sorted(values)
+        return sum(1 for a, b in zip(ordered, ordered[1:]) if a == b)
+    ordered = np.sort(np.frombuffer(values, dtype=np.uint64))
+    return int(np.count_nonzero(ordered[1:] == ordered[:-1]))
+
+def cmd_ids(args):
+    """Measure identifier allocation rate and collisions, optionally across worker processes."""
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix='bankbench'), 'ids.db')
+    db = Database(SQLiteBackend(path))
+    db.bootstrap_schema()
+    db.close()
+
+    report = {'operations': {}}
+    for kind in args.kinds:
+        jobs = [(path, kind, args.count // args.processes + (i < args.count % args.processes),
+                 args.batch_size, args.block_size) for i in range(args.processes)]
+        started = time.perf_counter()
+        if args.processes > 1:
+            with multiprocessing.Pool(args.processes) as pool:
+                results = pool.map(_allocate_ids, jobs)
+        else:
+            results = [_allocate_ids(jobs[0])]
+        elapsed = time.perf_counter() - started
+
+        values, timings, leases = array('Q'), [], 0
+        for packed, batch_timings, worker_leases in results:
+            values.frombytes(packed)
+            timings.extend(batch_timings)
+            leases += worker_leases
+        # Latency percentiles are per batch; failures are collisions
+        stats = summarize(timings, count_duplicates(values), elapsed)
+        stats.update(count=len(values), throughput=round(len(values) / elapsed, 2), leases=leases)
+        report['operations'][kind] = stats
+    report['config'] = {'db': path, 'count': args.count, 'processes': args.processes,
+                        'batch_size': args.batch_size, 'block_size': args.block_size,
+                        'python': platform.python_version(), 'platform': platform.platform()}
+    return report
+
+def _legacy_registration_error(username, password, name, address, aadhaar, mobile):
+    """The original per-field checks, with patterns looked up on every call, as a baseline."""
+
+    if not re.match("^[a-zA-Z0-9]{3,20}$", username):
+        return "Invalid username. It must be alphanumeric and between 3 to 20 characters."
+    if len(password) < 6:
+        return "Password is too short. It must be at least 6 characters long."
+    if not name.strip():
+        return "Name cannot be empty."
+    if not address.strip():
+        return "Address cannot be empty."
+    if not re.match(r"^\d{12}$", aadhaar):
+        return "Invalid Aadhaar. It must be a 12-digit number."
+    if not re.match(r"^\d{10}$", mobile):
+        return "Invalid mobile number. It must be a 10-digit number."
+    return None
+
+def registration_rows(count, invalid_rate, seed):
+    """Synthetic registration rows as columns, with roughly invalid_rate of them failing one check."""
+
+    rng = random.Random(seed)
+    columns = {field: [] for field in REGISTRATION_FIELDS}
+    for i in range(count):
+        row = {'username': f'user{i}', 'password': 'secret123', 'name': 'Bench User', 'address': '1 Bench Road',
+               'aadhaar': f'{rng.randrange(10 ** 12):012d}', 'mobile': f'{rng.randrange(10 ** 10):010d}'}
+        if rng.random() < invalid_rate:
+            field = rng.choice(REGISTRATION_FIELDS)
+            row[field] = {'username': 'x!', 'password': '123', 'name': ' ', 'address': '',
+                          'aadhaar': '12345', 'mobile': '98765abcde'}[field]
+        for field in REGISTRATION_FIELDS:
+            columns[field].append(row[field])
+    return columns
+
+def cmd_validate(args):
+    """Compare per-row validation against the column engine, in batches of rows."""
+
+    columns = registration_rows(args.count, args.invalid_rate, args.seed)
+    rows = list(zip(*(columns[field] for field in REGISTRATION_FIELDS)))
+    engines = {
+        'legacy_re': lambda lo, hi: [_legacy_registration_error(*row) for row in rows[lo:hi]],
+        'per_row': lambda lo, hi: [registration_error(*row) for row in rows[lo:hi]],
+        'columns': lambda lo, hi: REGISTRATION.first_errors({f: c[lo:hi] for f, c in columns.items()}),
+    }
+    try:
+        import numpy as np
+    except ImportError:
+        pass
+    else:
+        arrays = {field: np.array(column) for field, column in columns.items()}
+        engines['numpy'] = lambda lo, hi: REGISTRATION.first_errors({f: a[lo:hi] for f, a in arrays.items()})
+
+    expected = None
+    report = {'operations': {}}
+    for name, engine in engines.items():
+        if args.engines and name not in args.engines:
+            continue
+        verdicts, timings = [], []
+        for lo in range(0, args.count, args.batch_size):
+            began = time.perf_counter()
+            result = engine(lo, lo + args.batch_size)
+            timings.append(time.perf_counter() - began)
+            verdicts.extend(error if error is None or isinstance(error, str) else error.message for error in result)
+        elapsed = sum(timings)
+        expected = expected or verdicts
+        # Latency percentiles are per batch; failures are rows whose verdict disagrees with the first engine
+        stats = summarize(timings, sum(a != b for a, b in zip(expected, verdicts)), elapsed)
+        stats.update(count=len(verdicts), throughput=round(len(verdicts) / elapsed, 2),
+                     invalid=sum(v is not None for v in verdicts))
+        report['operations'][name] = stats
+    report['config'] = {'count': args.count, 'invalid_rate': args.invalid_rate, 'batch_size': args.batch_size,
+                        'seed': args.seed, 'python': platform.python_version(), 'platform': platform.platform()}
+    return report
+
+def cmd_kdf(args):
+    """Measure password verifications per second at each scrypt cost, per worker count."""
+
+    report = {'operations': {}}
+    cores = os.cpu_count() or 1
+    for n in args.costs:
+        hasher = ScryptHasher(n=n)
+        stored = hasher.hash(PASSWORD)
+        for workers in args.workers:
+            manager = PasswordManager(hasher, workers=workers, use_processes=args.processes)
+            samples = [[] for _ in range(workers)]
+            deadline = time.perf_counter() + args.duration
+
+            def worker(i):
+                while time.perf_counter() < deadline:
+                    began = time.perf_counter()
+                    manager.verify(stored, PASSWORD)
+                    samples[i].append(time.perf_counter() - began)
+
+            started = time.perf_counter()
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            manager.close()
+
+            stats = summarize([s for worker_samples in samples for s in worker_samples], 0, elapsed)
+            stats['per_core'] = round(stats['throughput'] / min(workers, cores), 2)
+            stats['memory_mb'] = round(128 * n * hasher.r / 2 ** 20, 1)
+            report['operations'][f'scrypt_n{n}_w{workers}'] = stats
+    report['config'] = {'costs': args.costs, 'workers': args.workers, 'processes': args.processes,
+                        'duration': args.duration, 'cpus': cores}
+    return report
+
+def main(argv=None):
+    """Command line entry point."""
+
+    parser = argparse.ArgumentParser(description="Benchmarks for the banking system.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    ops = sub.add_parser('ops', help="Drive a mix of BankSystem operations")
+    ops.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite')
+    ops.add_argument('--db', help="SQLite database path (default: a fresh temporary file; ':memory:' allowed)")
+    ops.add_argument('--mix', type=parse_mix, help="Weights, e.g. account_info=40,transfer=20,login=15")
+    ops.add_argument('--concurrency', type=int, default=4)
+    ops.add_argument('--duration', type=float, default=10.0, help="Seconds to run")
+    ops.add_argument('--users', type=int, default=200, help="Users to seed before the run")
+    ops.add_argument('--pool-size', type=int, default=8)
+    ops.add_argument('--seed', type=int, default=0)
+    ops.add_argument('--query-stats', action='store_true', help="Include per-statement timings in the report")
+    ops.add_argument('--scrypt-n', type=int, default=ScryptHasher().n, help="scrypt cost for stored passwords")
+    ops.set_defaults(func=cmd_ops)
+
+    kdf = sub.add_parser('kdf', help="Logins/sec per core at each password hashing cost")
+    kdf.add_argument('--costs', type=lambda text: [eval_power(c) for c in text.split(',')],
+                     default=[2 ** 12, 2 ** 14, 2 ** 15], help="scrypt n values, e.g. 2**12,2**14,32768")
+    kdf.add_argument('--workers', type=lambda text: [int(w) for w in text.split(',')],
+                     default=[1, os.cpu_count() or 1], help="Worker pool sizes to try, e.g. 1,4")
+    kdf.add_argument('--processes', action='store_true', help="Hash on a process pool instead of threads")
+    kdf.add_argument('--duration', type=float, default=3.0, help="Seconds per setting")
+    kdf.set_defaults(func=cmd_kdf)
+
+    ids = sub.add_parser('ids', help="Identifier allocation rate and collisions (reported as failures)")
+    ids.add_argument('--count', type=int, default=10_000_000, help="Identifiers per kind")
+    ids.add_argument('--kinds', nargs='+', default=['account', 'card', 'random_account', 'random_card'],
+                     choices=['account', 'card', 'random_account', 'random_card'])
+    ids.add_argument('--processes', type=int, default=1, help="Worker processes, each leasing its own blocks")
+    ids.add_argument('--batch-size', type=int, default=10000, help="Identifiers requested per call")
+    ids.add_argument('--block-size', type=int, default=1000, help="Sequence values leased per block")
+    ids.add_argument('--db', help="SQLite file holding id_blocks (default: a temp file)")
+    ids.set_defaults(func=cmd_ids)
+
+    validate = sub.add_parser('validate', help="Rows/sec of per-row versus column validation")
+    validate.add_argument('--count', type=int, default=1_000_000, help="Registration rows to validate")
+    validate.add_argument('--invalid-rate', type=float, default=0.05, help="Fraction of rows with one bad field")
+    validate.add_argument('--batch-size', type=int, default=50000, help="Rows per validation call")
+    validate.add_argument('--engines', nargs='+', choices=['legacy_re', 'per_row', 'columns', 'numpy'])
+    validate.add_argument('--seed', type=int, default=1)
+    validate.set_defaults(func=cmd_validate)
+
+    for command in sub.choices.values():
+        command.add_argument('--json', metavar='FILE', help="Write the report as JSON")
+        command.add_argument('--compare', metavar='FILE', help="Baseline JSON report to check for regressions")
+        command.add_argument('--tolerance', type=float, default=0.10, help="Allowed regression fraction")
+
+    args = parser.parse_args(argv)
+    report = args.func(args)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_reports(json.load(f), report, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
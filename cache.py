@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a time-to-live."""
+
+    def __init__(self, maxsize=10000, ttl=30.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # key -> one [stale] flag per load in flight; invalidate() sets them
+        self._loading = {}
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def get(self, key, default=None):
+        """Return a live cached value, counting the lookup as a hit or miss."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > self._clock():
+                    self._data.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return value
+                del self._data[key]
+                self.stats['expirations'] += 1
+            self.stats['misses'] += 1
+            return default
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries when full."""
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        self._data[key] = (value, self._clock() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def get_or_load(self, key, loader):
+        """Read through the cache, calling loader on a miss; None results are not cached.
+
+        A load that overlaps an invalidate() of its key is returned but not
+        stored, since it may have read the data from before the write.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        stale = self._begin_load(key)
+        try:
+            value = loader()
+        finally:
+            self._end_load(key, stale, value, missing)
+        return value
+
+    async def get_or_load_async(self, key, loader):
+        """Like get_or_load, but awaits loader(), a coroutine function."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        stale = self._begin_load(key)
+        try:
+            value = await loader()
+        finally:
+            self._end_load(key, stale, value, missing)
+        return value
+
+    def _begin_load(self, key):
+        stale = [False]
+        with self._lock:
+            self._loading.setdefault(key, []).append(stale)
+        return stale
+
+    def _end_load(self, key, stale, value, missing):
+        with self._lock:
+            loads = self._loading[key]
+            loads.remove(stale)
+            if not loads:
+                del self._loading[key]
+            if value is not missing and value is not None and not stale[0]:
+                self._store(key, value)
+
+    def invalidate(self, *keys):
+        """Drop the given keys if present, and keep loads already running for them from being stored."""
+        with self._lock:
+            for key in keys:
+                for stale in self._loading.get(key, ()):
+                    stale[0] = True
+                if self._data.pop(key, None) is not None:
+                    self.stats['invalidations'] += 1
+
+    def clear(self):
+        """Drop every entry, and keep loads already running from being stored."""
+        with self._lock:
+            self._data.clear()
+            for loads in self._loading.values():
+                for stale in loads:
+                    stale[0] = True
+
+    def __len__(self):
+        return len(self._data)
+
+    def snapshot(self):
+        """Return the counters along with current size and hit ratio."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self._data)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,42 @@
+from decimal import Decimal
+import pytest
+from backends import SQLiteBackend
+from banking import BankSystem
+from database import Database
+from passwords import PasswordManager, ScryptHasher
+
+# test_db.py is a manual smoke script against a live MySQL server, not a pytest module
+collect_ignore = ['test_db.py']
+
+PAYEE = '9999999999'
+
+
+@pytest.fixture
+def passwords():
+    # A low scrypt cost keeps registrations and logins fast
+    manager = PasswordManager(ScryptHasher(n=2 ** 8), workers=2)
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def bank(tmp_path, passwords):
+    """BankSystem on an SQLite file, so pooled connections run concurrently."""
+    db = Database(SQLiteBackend(str(tmp_path / 'bank.db')), pool_size=8)
+    db.bootstrap_schema()
+    yield BankSystem(db, passwords=passwords)
+    db.close()
+
+
+def register(bank, username, payee=PAYEE):
+    """Register a user (opening balance 1000) with payee as a beneficiary, returning the user_id."""
+    assert bank.register_user(username, 'secret123', 'Test User', 'Test Street', '123412341234', '9876543210')
+    user_id = bank.login(username, 'secret123')
+    assert bank.add_beneficiaries(user_id, 'Payee', payee)
+    return user_id
+
+
+def balance(bank, user_id):
+    """A user's balance read fresh from the database, past the account cache."""
+    bank.cache.clear()
+    return Decimal(str(bank.get_account_info(user_id)['balance']))
@@ -1,36 +1,270 @@
-import mysql.connector
+import itertools
+import threading
+import time
 from contextlib import contextmanager
-from mysql.connector import Error
+from backends import MySQLBackend, SCHEMA_FILE
+from cache import TTLCache
+from instrumentation import InstrumentedCursor
+from statements import StatementRegistry
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the timeout."""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of reusable database connections.
+
+    Connections are opened with autocommit off and nothing in Database turns
+    it on, so returning one to the pool only has to end its open
+    transaction; no session state is reset on the server.
+    """
+
+    def __init__(self, backend, size=5, timeout=10.0, ping_interval=30.0, reconnect_attempts=1):
+        self.backend = backend
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.reconnect_attempts = reconnect_attempts
+        self._idle = []
+        self._lock = threading.Lock()
+        # Signalled whenever a connection is returned or a slot is freed
+        self._available = threading.Condition(self._lock)
+        self._open = 0
+        self.stats = {'hits': 0, 'waits': 0, 'creations': 0, 'reconnects': 0, 'timeouts': 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _create(self):
+        """Open a new connection, giving back the reserved slot on failure."""
+        try:
+            conn = self.backend.connect()
+        except Exception:
+            self._free_slot()
+            raise
+        self._count('creations')
+        return conn
+
+    def _free_slot(self):
+        with self._available:
+            self._open -= 1
+            self._available.notify()
+
+    def _check_health(self, conn, last_used):
+        """Ping connections that sat idle too long, reconnecting if needed."""
+        if time.monotonic() - last_used < self.ping_interval:
+            return conn
+        try:
+            self.backend.ping(conn, attempts=self.reconnect_attempts)
+            return conn
+        except self.backend.errors:
+            self._count('reconnects')
+            # The replacement keeps the dead connection's slot; _create gives
+            # it back only if reconnecting fails.
+            self._close(conn)
+            return self._create()
+
+    def _discard(self, conn):
+        self._free_slot()
+        self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Check out a connection, waiting up to the pool timeout.
+
+        A waiter takes the first connection returned, or opens a new one as
+        soon as a broken connection is discarded and frees its slot.
+        """
+        deadline = None
+        with self._available:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    self.stats['hits'] += 1
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    conn = None
+                    break
+                if deadline is None:
+                    self.stats['waits'] += 1
+                    deadline = time.monotonic() + self.timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise PoolTimeout(f"No connection available within {self.timeout}s")
+                self._available.wait(remaining)
+        if conn is None:
+            return self._create()
+        return self._check_health(conn, last_used)
+
+    def release(self, conn):
+        """Return a connection to the pool, dropping it if it is broken."""
+        try:
+            if not conn.is_connected():
+                self._discard(conn)
+                return
+            if conn.in_transaction:
+                conn.rollback()
+        except self.backend.errors:
+            self._discard(conn)
+            return
+        with self._available:
+            self._idle.append((conn, time.monotonic()))
+            self._available.notify()
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def snapshot(self):
+        """Return pool counters along with current occupancy."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['open'] = self._open
+        stats['idle'] = len(self._idle)
+        stats['size'] = self.size
+        return stats
+
 
 class Database:
-    """Class to handle mysql database connections and queries."""
-
-    def __init__(self):
-        self.config = {
-            'host': 'localhost',  
-            'port': 3306,  # Default MySQL port
-            'user': 'root',
-            'password' : 'root@123',
-            'database' : 'Bash_db',
-            'raise_on_warnings' : True
-        }
-        self.connection = None
+    """Class to handle database connections and queries over a pluggable backend.
+
+    ``replicas`` is an optional list of backends for read replicas of the
+    primary; see execute_read.
+    """
+
+    def __init__(self, backend=None, pool_size=5, pool_timeout=10.0, ping_interval=30.0, instrument=None,
+                 statements=None, replicas=None, sticky_for=5.0, replica_retry=30.0):
+        self.backend = backend or MySQLBackend()
+        self.instrument = instrument
+        self.statements = statements or StatementRegistry(self.backend)
+        self.errors = self.backend.errors + (PoolTimeout,)
+        if self.backend.max_connections:
+            pool_size = min(pool_size, self.backend.max_connections)
+        self.pool = ConnectionPool(
+            self.backend,
+            size=pool_size,
+            timeout=pool_timeout,
+            ping_interval=ping_interval,
+        )
+        self._local = threading.local()
+        self.replicas = [
+            ConnectionPool(replica, size=pool_size, timeout=pool_timeout, ping_interval=ping_interval)
+            for replica in replicas or ()
+        ]
+        self.sticky_for = sticky_for
+        self.replica_retry = replica_retry
+        self._next_replica = itertools.count()
+        self._replica_down = {}
+        self._written = TTLCache(maxsize=100000, ttl=sticky_for)
+
+    @property
+    def connection(self):
+        """Connection checked out by the current thread, if any."""
+        return getattr(self._local, 'connection', None)
+
+    @connection.setter
+    def connection(self, conn):
+        self._local.connection = conn
+
+    def _acquire(self):
+        """Check a connection out of the pool, timing the wait when instrumented."""
+        if self.instrument is None:
+            return self.pool.acquire()
+        began = time.perf_counter()
+        try:
+            return self.pool.acquire()
+        finally:
+            self.instrument.record_acquire(time.perf_counter() - began)
+
+    def _cursor(self, conn):
+        """Open a dictionary cursor, wrapped for instrumentation when enabled."""
+        cursor = conn.cursor(dictionary=True)
+        if self.instrument is None:
+            return cursor
+        return InstrumentedCursor(cursor, self.instrument)
+
+    def statement(self, name, conn=None):
+        """Prepared statement called name on conn, or on the connection this thread has checked out.
+
+        Use inside transaction() to run registry statements alongside its cursor.
+        """
+        return self.statements.cursor(conn or self.connection, name, self.instrument)
 
     @contextmanager
     def get_connection(self):
-        """Context manager for database connection."""
+        """Context manager that checks a connection out of the pool."""
 
+        previous = self.connection
         try:
-            self.connection = mysql.connector.connect(**self.config)
-            yield self.connection
+            conn = self._acquire()
+        except self.errors as e:
+            print(f"Database error: {e}")
+            raise
+        try:
+            self.connection = conn
+            yield conn
 
-        except Error as e:
+        except self.errors as e:
             print(f"Database error: {e}")
-        
+
+        finally:
+            self.pool.release(conn)
+            self.connection = previous
+
+    @contextmanager
+    def transaction(self):
+        """Run a block as one transaction on one pooled connection, yielding its cursor.
+
+        Unlike get_connection, errors are rolled back and re-raised so the
+        caller can tell whether the transaction committed.
+        """
+        previous = self.connection
+        conn = self._acquire()
+        self.connection = conn
+        cursor = self._cursor(conn)
+        try:
+            yield cursor
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
         finally:
-            if self.connection and self.connection.is_connected():
-                self.connection.close()
-                self.connection = None
+            cursor.close()
+            self.pool.release(conn)
+            self.connection = previous
+
+    def close(self):
+        """Close all pooled connections."""
+        self.pool.close()
+        self.backend.close()
+        for pool in self.replicas:
+            pool.close()
+            pool.backend.close()
+
+    def bootstrap_schema(self, path=SCHEMA_FILE):
+        """Create any missing tables from the schema file and migrate existing ones; errors are raised.
+
+        Migrations describe the shipped schema file, so they only run when
+        bootstrapping from it.
+        """
+        with self.transaction():
+            self.backend.bootstrap(self.connection, path)
+        if path == SCHEMA_FILE:
+            from migrations import migrate
+            migrate(self)
 
     def start_transaction(self):
         """Start a transaction."""
@@ -55,11 +289,11 @@ class Database:
             print("Transaction rolled back.")
         except Exception as e:
             print(f"Error rolling back transaction: {e}")
-   
+
     def execute_query(self, query,params = None, fetch = False):
         """Execute a query and return results if fetch is True."""
         with self.get_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = self._cursor(conn)
             try:
                 cursor.execute(query, params or ())
                 if fetch:
@@ -68,9 +302,101 @@ class Database:
                 else:
                     conn.commit()
                     return cursor.rowcount
-            
-            except Error as e:
+
+            except self.backend.errors as e:
                 print(f"Query error: {e}")
                 return None
             finally:
-                cursor.close()
\ No newline at end of file
+                cursor.close()
+
+    def execute_statement(self, name, params=None, fetch=False):
+        """execute_query for a named registry statement, run through its prepared cursor."""
+        with self.get_connection() as conn:
+            try:
+                stmt = self.statement(name, conn)
+                stmt.execute(params or ())
+                if fetch:
+                    return stmt.fetchall()
+                conn.commit()
+                return stmt.rowcount
+            except self.backend.errors as e:
+                print(f"Query error: {e}")
+                return None
+
+    def mark_written(self, session):
+        """Send a session's reads to the primary for sticky_for seconds, so it never reads past its own writes."""
+        if self.replicas and session is not None:
+            self._written.set(session, True)
+
+    def _healthy_replicas(self):
+        """Indexes of the replicas not marked down, starting from the next in round-robin order."""
+        now = time.monotonic()
+        start = next(self._next_replica)
+        count = len(self.replicas)
+        order = ((start + i) % count for i in range(count))
+        return [i for i in order if self._replica_down.get(i, 0) <= now]
+
+    def _replica_fetch(self, pool, name, params):
+        conn = pool.acquire()
+        try:
+            stmt = self.statements.cursor(conn, name, self.instrument)
+            stmt.execute(params or ())
+            return stmt.fetchall()
+        finally:
+            pool.release(conn)
+
+    def execute_read(self, name, params=None, session=None):
+        """Rows of a read-only registry statement, served by a replica when one can be used.
+
+        Replicas take reads in turn. One that fails or times out is left out
+        for replica_retry seconds and the read moves to the next. Reads go to
+        the primary when there are no healthy replicas, or when session
+        (e.g. a user_id) wrote within the last sticky_for seconds and a
+        lagging replica could still show the old data.
+        """
+        if self.replicas and not (session is not None and self._written.get(session)):
+            for i in self._healthy_replicas():
+                pool = self.replicas[i]
+                try:
+                    return self._replica_fetch(pool, name, params)
+                except pool.backend.errors + (PoolTimeout,) as e:
+                    print(f"Replica {i} unavailable: {e}")
+                    self._replica_down[i] = time.monotonic() + self.replica_retry
+        return self.execute_statement(name, params, fetch=True)
+
+    def stream_query(self, query, params=None, batch_size=500):
+        """Yield result rows one at a time, fetching batch_size rows per round trip.
+
+        The pooled connection is held until the generator is exhausted or
+        closed, so memory stays constant however many rows match. Unlike
+        get_connection, errors are raised after the cursor is cleaned up, so a
+        failed query or a connection dropped mid-fetch is never mistaken for
+        the end of the results.
+        """
+        previous = self.connection
+        conn = self._acquire()
+        self.connection = conn
+        cursor = self._cursor(conn)
+        exhausted = False
+        try:
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    exhausted = True
+                    break
+                yield from rows
+        finally:
+            if not exhausted:
+                # Unbuffered drivers refuse to close a cursor with unread rows
+                try:
+                    while cursor.fetchmany(batch_size):
+                        pass
+                except self.backend.errors:
+                    pass
+            try:
+                cursor.close()
+            except self.backend.errors:
+                pass
+            self.pool.release(conn)
+            self.connection = previous
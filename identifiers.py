@@ -0,0 +1,145 @@
+import os
+import secrets
+import threading
+
+# Sequence values are scrambled with an affine permutation x -> (a * x + c) mod space,
+# which is a bijection whenever a shares no factor with the space (a power of ten), so
+# distinct sequence values always give distinct numbers. Every process must use the
+# same constants.
+ACCOUNT_SPACE = 10 ** 10
+ACCOUNT_MULTIPLIER = 7919461397
+ACCOUNT_OFFSET = 3141592653
+
+# Card numbers are the issuer prefix, a permuted body and a Luhn check digit: 16 digits.
+CARD_PREFIX = '9'
+CARD_MULTIPLIER = 48271654903217
+CARD_OFFSET = 27182818284590
+
+# user_id is a signed INT column
+USER_SPACE = 2 ** 31 - 1
+
+# Each digit mapped to the digit sum of its double, as the Luhn test needs
+_DOUBLED = str.maketrans('0123456789', '0246813579')
+
+
+def permute(value, space, multiplier, offset):
+    """Map a sequence value onto [0, space) one-to-one."""
+    return (multiplier * value + offset) % space
+
+
+def luhn_check_digit(payload):
+    """Check digit that makes payload + digit pass the Luhn test."""
+    digits = payload[::-1]
+    total = sum(map(int, digits[::2].translate(_DOUBLED))) + sum(map(int, digits[1::2]))
+    return str(-total % 10)
+
+
+def luhn_valid(number):
+    """True if a string of digits passes the Luhn test."""
+    return number.isdigit() and len(number) > 1 and luhn_check_digit(number[:-1]) == number[-1]
+
+
+def account_number(sequence):
+    """10 digit account number for a sequence value."""
+    return f"{permute(sequence, ACCOUNT_SPACE, ACCOUNT_MULTIPLIER, ACCOUNT_OFFSET):010d}"
+
+
+def card_number(sequence, prefix=CARD_PREFIX):
+    """16 digit, Luhn-valid card number for a sequence value."""
+    width = 15 - len(prefix)
+    payload = f"{prefix}{permute(sequence, 10 ** width, CARD_MULTIPLIER, CARD_OFFSET):0{width}d}"
+    return payload + luhn_check_digit(payload)
+
+
+def random_digits(k):
+    """k random digits from the OS CSPRNG, for PINs and CVVs."""
+    return f"{secrets.randbelow(10 ** k):0{k}d}"
+
+
+class IdentifierAllocator:
+    """Hands out unique account and card numbers from sequence blocks leased in id_blocks.
+
+    Each process leases a contiguous block of sequence values per kind in one
+    short transaction and then allocates from it in memory, so parallel
+    workers only meet on id_blocks once per block and can never hand out the
+    same value. Values left in a block when the process exits are skipped.
+    """
+
+    def __init__(self, db, block_size=1000, card_prefix=CARD_PREFIX):
+        self.db = db
+        self.block_size = block_size
+        self.card_prefix = card_prefix
+        self.spaces = {'account': ACCOUNT_SPACE, 'card': 10 ** (15 - len(card_prefix)), 'user': USER_SPACE}
+        self.leases = 0
+        self._blocks = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._lease_query = f"""
+        INSERT INTO id_blocks (name, next_value) VALUES (%s, %s)
+        {db.backend.upsert_clause('id_blocks', ('name',), increment=('next_value',))}
+        """
+
+    def _lease_size(self, count):
+        return max(self.block_size, count)
+
+    def _leased(self, name, size, end):
+        """Record a newly leased block ending at end."""
+        if end > self.spaces[name]:
+            raise RuntimeError(f"{name} number space exhausted")
+        self.leases += 1
+        self._blocks[name] = (end - size, end)
+
+    def _claim(self, name, count):
+        """Take up to count values from the current block, returning a range."""
+        if os.getpid() != self._pid:
+            # A forked child must not hand out its parent's leased values
+            self._blocks.clear()
+            self._pid = os.getpid()
+        start, end = self._blocks.get(name, (0, 0))
+        taken = min(end - start, count)
+        self._blocks[name] = (start + taken, end)
+        return range(start, start + taken)
+
+    def _reserve(self, name, size):
+        """Lease the next size sequence values for name, returning the block's end."""
+        with self.db.transaction() as cursor:
+            cursor.execute(self._lease_query, (name, size))
+            cursor.execute("SELECT next_value FROM id_blocks WHERE name = %s", (name,))
+            return cursor.fetchone()['next_value']
+
+    def _take(self, name, count):
+        """Return count fresh sequence values for name as a list of ranges."""
+        ranges = []
+        with self._lock:
+            while count:
+                taken = self._claim(name, count)
+                if not taken:
+                    size = self._lease_size(count)
+                    self._leased(name, size, self._reserve(name, size))
+                    continue
+                ranges.append(taken)
+                count -= len(taken)
+        return ranges
+
+    def _cards(self, ranges):
+        return [card_number(value, self.card_prefix) for taken in ranges for value in taken]
+
+    def account_numbers(self, count):
+        """count unique 10 digit account numbers."""
+        return [account_number(value) for taken in self._take('account', count) for value in taken]
+
+    def account_number(self):
+        """One unique 10 digit account number."""
+        return self.account_numbers(1)[0]
+
+    def user_ids(self, count):
+        """count unique user ids, for databases that must not assign their own (sharded users)."""
+        return [value + 1 for taken in self._take('user', count) for value in taken]
+
+    def card_numbers(self, count):
+        """count unique, Luhn-valid 16 digit card numbers."""
+        return self._cards(self._take('card', count))
+
+    def card_number(self):
+        """One unique, Luhn-valid 16 digit card number."""
+        return self.card_numbers(1)[0]
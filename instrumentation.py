@@ -0,0 +1,206 @@
+import logging
+import os
+import re
+import threading
+import time
+
+slow_query_logger = logging.getLogger('banking.slow_queries')
+# One file handler per slow log path, shared by every QueryStats writing to it
+_slow_log_handlers = {}
+_slow_log_lock = threading.Lock()
+
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_ROW_LIST = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_normalized = {}
+
+
+def normalize_query(query):
+    """Collapse a statement to a stable key: literals and placeholder lists folded, whitespace squeezed."""
+    key = _normalized.get(query)
+    if key is None:
+        key = ' '.join(query.split())
+        key = _LITERALS.sub('?', key)
+        key = _PLACEHOLDER_LIST.sub('(...)', key)
+        key = _ROW_LIST.sub('(...)', key)
+        if len(_normalized) < 10000:
+            _normalized[query] = key
+    return key
+
+
+def _attach_slow_log(path):
+    """Send the slow query log to path as well, unless a handler for it is already attached."""
+    path = os.path.abspath(path)
+    with _slow_log_lock:
+        if path in _slow_log_handlers:
+            return
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        _slow_log_handlers[path] = handler
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.INFO)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, failures, elapsed):
+    """Throughput and latency percentiles for one operation's samples."""
+    latencies = sorted(latencies)
+    return {
+        'count': len(latencies),
+        'failures': failures,
+        'throughput': round(len(latencies) / elapsed, 2),
+        'mean_ms': round(1000 * sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'p50_ms': round(1000 * percentile(latencies, 50), 3),
+        'p95_ms': round(1000 * percentile(latencies, 95), 3),
+        'p99_ms': round(1000 * percentile(latencies, 99), 3),
+        'max_ms': round(1000 * latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+class QueryStats:
+    """Aggregates per-statement timings, row counts and errors, and logs slow queries.
+
+    Attach one to Database.instrument; any object with the same record_*
+    methods can be plugged in instead.
+    """
+
+    def __init__(self, slow_query_threshold=0.5, slow_log_path=None):
+        self.slow_query_threshold = slow_query_threshold
+        self._lock = threading.Lock()
+        self._queries = {}
+        self._acquire = {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0}
+        if slow_log_path:
+            _attach_slow_log(slow_log_path)
+
+    def _entry(self, key):
+        entry = self._queries.get(key)
+        if entry is None:
+            entry = self._queries[key] = {
+                'count': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                'rows_returned': 0, 'rows_affected': 0,
+            }
+        return entry
+
+    def record_acquire(self, seconds):
+        """Record how long a caller waited for a pooled connection."""
+        with self._lock:
+            self._acquire['count'] += 1
+            self._acquire['seconds'] += seconds
+            self._acquire['max_seconds'] = max(self._acquire['max_seconds'], seconds)
+
+    def record_query(self, query, seconds, rows_affected=0, error=None):
+        """Record one statement execution."""
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entry(key)
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            if error is not None:
+                entry['errors'] += 1
+            elif rows_affected and rows_affected > 0:
+                entry['rows_affected'] += rows_affected
+        if seconds >= self.slow_query_threshold:
+            slow_query_logger.warning("slow query %.1f ms%s: %s", seconds * 1000,
+                                      f" ({type(error).__name__})" if error is not None else '', key)
+
+    def record_rows(self, query, rows):
+        """Record rows fetched by a statement."""
+        key = normalize_query(query)
+        with self._lock:
+            self._entry(key)['rows_returned'] += rows
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        with self._lock:
+            self._queries.clear()
+            self._acquire.update(count=0, seconds=0.0, max_seconds=0.0)
+
+    def snapshot(self):
+        """Return a copy of the aggregates, slowest total time first."""
+        with self._lock:
+            queries = {key: dict(entry) for key, entry in self._queries.items()}
+            acquire = dict(self._acquire)
+        for entry in queries.values():
+            entry['mean_seconds'] = entry['seconds'] / entry['count'] if entry['count'] else 0.0
+        ordered = dict(sorted(queries.items(), key=lambda item: item[1]['seconds'], reverse=True))
+        return {'queries': ordered, 'connection_acquire': acquire}
+
+    def prometheus(self, prefix='bank'):
+        """Render the aggregates in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        metrics = [
+            ('query_count_total', 'counter', 'Statements executed', 'count'),
+            ('query_errors_total', 'counter', 'Statements that raised', 'errors'),
+            ('query_seconds_total', 'counter', 'Time spent executing statements', 'seconds'),
+            ('query_max_seconds', 'gauge', 'Slowest single execution', 'max_seconds'),
+            ('query_rows_returned_total', 'counter', 'Rows fetched', 'rows_returned'),
+            ('query_rows_affected_total', 'counter', 'Rows written', 'rows_affected'),
+        ]
+        lines = []
+        for name, kind, help_text, field in metrics:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for key, entry in snapshot['queries'].items():
+                label = key.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                lines.append(f'{prefix}_{name}{{query="{label}"}} {entry[field]}')
+        acquire = snapshot['connection_acquire']
+        lines.append(f"# HELP {prefix}_connection_acquire_seconds Time spent waiting for pooled connections")
+        lines.append(f"# TYPE {prefix}_connection_acquire_seconds summary")
+        lines.append(f"{prefix}_connection_acquire_seconds_count {acquire['count']}")
+        lines.append(f"{prefix}_connection_acquire_seconds_sum {acquire['seconds']}")
+        return '\n'.join(lines) + '\n'
+
+
+class InstrumentedCursor:
+    """Cursor wrapper that reports each statement to an instrument."""
+
+    def __init__(self, cursor, instrument):
+        self._cursor = cursor
+        self._instrument = instrument
+        self._query = None
+
+    def _timed(self, method, query, params):
+        self._query = query
+        began = time.perf_counter()
+        try:
+            method(query, params)
+        except Exception as e:
+            self._instrument.record_query(query, time.perf_counter() - began, error=e)
+            raise
+        elapsed = time.perf_counter() - began
+        is_read = query.lstrip()[:6].upper() == 'SELECT'
+        self._instrument.record_query(query, elapsed, 0 if is_read else self._cursor.rowcount)
+
+    def execute(self, query, params=()):
+        self._timed(self._cursor.execute, query, params)
+
+    def executemany(self, query, seq_of_params):
+        self._timed(self._cursor.executemany, query, seq_of_params)
+
+    def _fetched(self, rows):
+        if self._query is not None:
+            self._instrument.record_rows(self._query, len(rows))
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._fetched([row])
+        return row
+
+    def fetchmany(self, size=1):
+        return self._fetched(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self._fetched(self._cursor.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
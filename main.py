@@ -1,6 +1,13 @@
+import argparse
 import getpass
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
 from banking import BankSystem
-from validation import validate_login, validate_registration
+from instrumentation import summarize
+from validation import REGISTRATION_FIELDS, registration_error, validate_login, validate_registration
 
 def display_menu():
     """Display the main menu options."""
@@ -24,9 +31,9 @@ def display_user_menu():
     print("9. Logout")
     return input("Enter choice (1-9): ")
 
-def main():
-    """Main function to run the banking system."""
-    bank = BankSystem()
+def run_menu(bank=None):
+    """Run the interactive menu loop."""
+    bank = bank or BankSystem()
 
     while True:
         choice = display_menu()
@@ -170,5 +177,242 @@ def main():
         else:
             print("Invalid choice.")
 
+class CommandError(Exception):
+    """An operation that could not be carried out; the message is reported as its error."""
+
+
+def _masked_cards(cards):
+    return [{'card_type': c['card_type'], 'card_number': f"****{c['card_number'][-4:]}", 'pin': c['pin'],
+             'cvv': c['cvv']} for c in cards]
+
+def _register(bank, session, args):
+    fields = [args[field] for field in REGISTRATION_FIELDS]
+    error = registration_error(*fields)
+    if error:
+        raise CommandError(error)
+    if not bank.register_user(*fields):
+        raise CommandError("Registration failed. Username may exist.")
+    return {'username': args['username']}
+
+def _login(bank, session, args):
+    if not validate_login(args['username'], args['password']):
+        raise CommandError("Invalid username or password format.")
+    user_id = bank.login(args['username'], args['password'])
+    if not user_id:
+        raise CommandError("Login failed. Check credentials.")
+    session['user_id'] = user_id
+    return {'user_id': user_id}
+
+def _logout(bank, session, args):
+    session.pop('user_id', None)
+    return {}
+
+def _account_info(bank, user_id, args):
+    return {'account': bank.get_account_info(user_id)}
+
+def _beneficiaries(bank, user_id, args):
+    return {'beneficiaries': bank.get_beneficiaries(user_id)}
+
+def _cards(bank, user_id, args):
+    return {'cards': _masked_cards(bank.get_cards(user_id))}
+
+def _add_beneficiary(bank, user_id, args):
+    if not bank.add_beneficiaries(user_id, args['name'], args['account_number']):
+        raise CommandError("Failed to add beneficiary.")
+    return {'beneficiaries': bank.get_beneficiaries(user_id)}
+
+def _update_account(bank, user_id, args):
+    if not bank.update_account_info(user_id, *(args.get(field) or '' for field in ('name', 'address', 'mobile'))):
+        raise CommandError("Update failed.")
+    return {'account': bank.get_account_info(user_id)}
+
+def _transfer(bank, user_id, args):
+    try:
+        amount = float(args['amount'])
+    except ValueError:
+        raise CommandError("Invalid amount.")
+    if not bank.transfer_funds(user_id, args['account_number'], amount, args.get('idempotency_key')):
+        raise CommandError("Transfer failed. Check account number or balance.")
+    return {'balance': bank.get_account_info(user_id).get('balance')}
+
+def _change_pin(bank, user_id, args):
+    if not bank.change_card_pin(user_id, args['last4'], args['pin']):
+        raise CommandError("Failed to update PIN.")
+    return {'cards': _masked_cards(bank.get_cards(user_id))}
+
+def _add_card(bank, user_id, args):
+    if not bank.add_credit_card(user_id):
+        raise CommandError("Failed to add card.")
+    return {'cards': _masked_cards(bank.get_cards(user_id))}
+
+# Operation name -> (handler, needs a logged-in user, required arguments,
+# optional arguments). Session handlers get the session dict; the others get
+# the logged-in user_id. Arguments are strings, except that amount may also be
+# a number and optional arguments may be null.
+OPERATIONS = {
+    'register': (_register, False, REGISTRATION_FIELDS, ()),
+    'login': (_login, False, ('username', 'password'), ()),
+    'logout': (_logout, False, (), ()),
+    'account-info': (_account_info, True, (), ()),
+    'beneficiaries': (_beneficiaries, True, (), ()),
+    'cards': (_cards, True, (), ()),
+    'add-beneficiary': (_add_beneficiary, True, ('name', 'account_number'), ()),
+    'update-account': (_update_account, True, (), ('name', 'address', 'mobile')),
+    'transfer': (_transfer, True, ('account_number', 'amount'), ('idempotency_key',)),
+    'change-pin': (_change_pin, True, ('last4', 'pin'), ()),
+    'add-card': (_add_card, True, (), ()),
+}
+
+def _argument_error(op, args):
+    """What is wrong with an operation's arguments, or None if they fit its OPERATIONS entry."""
+    _, _, required, optional = OPERATIONS[op]
+    for name in args:
+        if name not in required and name not in optional:
+            return f"Unexpected argument for {op}: {name}"
+    for name in required:
+        if name not in args:
+            return f"Missing argument for {op}: {name}"
+    for name, value in args.items():
+        if value is None and name in optional:
+            continue
+        if not isinstance(value, str) and not (name == 'amount' and type(value) in (int, float)):
+            return f"Argument {name} for {op} must be a string"
+    return None
+
+def run_operation(bank, session, op, args):
+    """Run one named operation for a session, returning a JSON-ready result with ok and, on failure, error."""
+    try:
+        handler, needs_user, _, _ = OPERATIONS[op]
+    except (KeyError, TypeError):
+        return {'ok': False, 'error': f"Unknown operation: {op}"}
+    error = _argument_error(op, args)
+    if error:
+        return {'ok': False, 'error': error}
+    if needs_user and not session.get('user_id'):
+        return {'ok': False, 'error': "Not logged in."}
+    try:
+        # Keep the bank's own messages off stdout, which carries the JSON results
+        with redirect_stdout(sys.stderr):
+            result = handler(bank, session['user_id'] if needs_user else session, args)
+    except CommandError as e:
+        return {'ok': False, 'error': str(e)}
+    except bank.db.errors + (ValueError,) as e:
+        # A failed query or a rejected value fails this operation, not the whole run
+        return {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+    return dict({'ok': True}, **result)
+
+def run_script(bank, lines, out=sys.stdout):
+    """Replay JSONL operations through one bank and session, writing a timed result per operation.
+
+    Each line is an object with "op" (an OPERATIONS name) and its arguments,
+    e.g. {"op": "login", "username": "...", "password": "..."}. A final line
+    summarises latency per operation. Returns the number of failed operations.
+    """
+    session, latencies, failures = {}, {}, {}
+    started = time.perf_counter()
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            args = json.loads(line)
+            if not isinstance(args, dict):
+                raise ValueError("not an object")
+            op = args.pop('op')
+            if not isinstance(op, str):
+                raise ValueError("op is not a string")
+        except (ValueError, KeyError):
+            result, op, elapsed = {'ok': False, 'error': "Malformed operation."}, None, 0.0
+        else:
+            began = time.perf_counter()
+            result = run_operation(bank, session, op, args)
+            elapsed = time.perf_counter() - began
+        latencies.setdefault(op, []).append(elapsed)
+        failures[op] = failures.get(op, 0) + (not result['ok'])
+        out.write(json.dumps(dict({'line': number, 'op': op, 'ms': round(1000 * elapsed, 3)}, **result), default=str) + "\n")
+    elapsed = time.perf_counter() - started
+    summary = {str(op): summarize(samples, failures[op], elapsed) for op, samples in latencies.items()}
+    out.write(json.dumps({'summary': summary, 'elapsed_s': round(elapsed, 3)}) + "\n")
+    return sum(failures.values())
+
+def _password(args):
+    """Password from --password, then the BANK_PASSWORD environment variable, then a prompt."""
+    return args.password or os.environ.get('BANK_PASSWORD') or getpass.getpass("Password: ")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="BashBank. Run without arguments for the interactive menu.")
+    parser.add_argument('--sqlite', metavar='DB', help="Use an SQLite database file instead of MySQL")
+    sub = parser.add_subparsers(dest='command')
+
+    register = sub.add_parser('register', help="Register a new user")
+    for field in ('username', 'name', 'address', 'aadhaar', 'mobile'):
+        register.add_argument(f'--{field}', required=True)
+    register.add_argument('--password', help="Defaults to $BANK_PASSWORD, else prompted")
+
+    def user_command(name, help):
+        command = sub.add_parser(name, help=help)
+        command.add_argument('--username', required=True)
+        command.add_argument('--password', help="Defaults to $BANK_PASSWORD, else prompted")
+        return command
+
+    user_command('account-info', "Display account info")
+    user_command('beneficiaries', "List beneficiaries")
+    user_command('cards', "List cards")
+    command = user_command('add-beneficiary', "Add a beneficiary")
+    command.add_argument('--name', required=True)
+    command.add_argument('--account-number', required=True)
+    command = user_command('update-account', "Update account info; omitted fields are kept")
+    command.add_argument('--name')
+    command.add_argument('--address')
+    command.add_argument('--mobile')
+    command = user_command('transfer', "Transfer funds to a beneficiary")
+    command.add_argument('--account-number', required=True)
+    command.add_argument('--amount', required=True)
+    command.add_argument('--idempotency-key')
+    command = user_command('change-pin', "Change a card's PIN")
+    command.add_argument('--last4', required=True)
+    command.add_argument('--pin', required=True)
+    user_command('add-card', "Register a new credit card")
+
+    script = sub.add_parser('run', help="Replay a JSONL file of operations through one session, with timings")
+    script.add_argument('path', help="JSONL operations file, or - for stdin")
+    return parser
+
+def main(argv=None):
+    """Run the interactive menu, or one command or operations script when given arguments."""
+    args = build_parser().parse_args(argv)
+    if args.sqlite:
+        from backends import SQLiteBackend
+        from database import Database
+        db = Database(SQLiteBackend(args.sqlite))
+        db.bootstrap_schema()
+        bank = BankSystem(db)
+    else:
+        bank = BankSystem()
+    if args.command is None:
+        run_menu(bank)
+        return 0
+
+    try:
+        if args.command == 'run':
+            if args.path == '-':
+                return 1 if run_script(bank, sys.stdin) else 0
+            with open(args.path) as f:
+                return 1 if run_script(bank, f) else 0
+
+        options = {key: value for key, value in vars(args).items() if key not in ('sqlite', 'command')}
+        options['password'] = _password(args)
+        session = {}
+        result = {'ok': True}
+        if args.command != 'register':
+            credentials = {key: options.pop(key) for key in ('username', 'password')}
+            result = run_operation(bank, session, 'login', credentials)
+        if result['ok']:
+            result = run_operation(bank, session, args.command, options)
+        print(json.dumps(dict({'command': args.command}, **result), indent=2, default=str))
+        return 0 if result['ok'] else 1
+    finally:
+        bank.db.close()
+
 if __name__ == "__main__":
-    main()        
+    sys.exit(main())
+
@@ -0,0 +1,258 @@
+import argparse
+import sys
+from collections import namedtuple
+from datetime import datetime
+from backends import SCHEMA_FILE, table_statement
+
+# Versions already applied are recorded here; a version runs at most once.
+SCHEMA_MIGRATIONS = """
+CREATE TABLE schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    applied_at DATETIME NOT NULL
+)
+"""
+
+Migration = namedtuple('Migration', ['version', 'name', 'steps'])
+
+
+class AddIndex:
+    """CREATE INDEX, skipped when an index of that name already exists."""
+
+    def __init__(self, table, name, columns, unique=False):
+        self.table = table
+        self.name = name
+        self.columns = columns
+        self.unique = unique
+
+    def applied(self, cursor, backend):
+        return backend.has_index(cursor, self.table, self.name)
+
+    def statements(self, backend):
+        return [f"CREATE {'UNIQUE ' if self.unique else ''}INDEX {self.name} "
+                f"ON {self.table} ({', '.join(self.columns)})"]
+
+
+class DropIndex:
+    """DROP INDEX, skipped when no index of that name exists."""
+
+    def __init__(self, table, name):
+        self.table = table
+        self.name = name
+
+    def applied(self, cursor, backend):
+        return not backend.has_index(cursor, self.table, self.name)
+
+    def statements(self, backend):
+        if backend.name == 'sqlite':
+            return [f"DROP INDEX {self.name}"]
+        return [f"DROP INDEX {self.name} ON {self.table}"]
+
+
+class AddColumn:
+    """ALTER TABLE ... ADD COLUMN, followed by the statements in then (backfills, indexes) on the same run."""
+
+    def __init__(self, table, column, definition, then=()):
+        self.table = table
+        self.column = column
+        self.definition = definition
+        self.then = list(then)
+
+    def applied(self, cursor, backend):
+        return backend.has_column(cursor, self.table, self.column)
+
+    def statements(self, backend):
+        return [f"ALTER TABLE {self.table} ADD COLUMN {self.column} {self.definition}"] + self.then
+
+
+class CreateTable:
+    """A table exactly as the schema file defines it, with its indexes."""
+
+    def __init__(self, table, path=SCHEMA_FILE):
+        self.table = table
+        self.path = path
+
+    def applied(self, cursor, backend):
+        return backend.has_table(cursor, self.table)
+
+    def statements(self, backend):
+        return backend.ddl(table_statement(self.table, self.path))
+
+
+class Sql:
+    """Raw statements for the named backends only, skipped when done(cursor, backend) is true."""
+
+    def __init__(self, statements, done, backends=None):
+        self._statements = list(statements)
+        self.done = done
+        self.backends = backends
+
+    def applied(self, cursor, backend):
+        if self.backends is not None and backend.name not in self.backends:
+            return True
+        return self.done(cursor, backend)
+
+    def statements(self, backend):
+        return self._statements
+
+
+def _password_widened(cursor, backend):
+    cursor.execute("""
+    SELECT character_maximum_length AS width FROM information_schema.columns
+    WHERE table_schema = DATABASE() AND table_name = 'users' AND column_name = 'password'
+    """)
+    return cursor.fetchone()['width'] >= 255
+
+
+# Every schema change since the original schema file, oldest first. Never edit
+# a released migration; add a new version instead. The schema file always
+# describes the latest version, so a freshly bootstrapped database finds every
+# step already applied and only records the versions.
+MIGRATIONS = [
+    Migration(1, 'widen password for salted hashes', [
+        Sql(["ALTER TABLE users MODIFY password VARCHAR(255) NOT NULL"], _password_widened, backends=('mysql',)),
+    ]),
+    Migration(2, 'transaction history index', [
+        AddIndex('transactions', 'idx_transactions_user_date', ('user_id', 'transaction_date', 'transaction_id')),
+    ]),
+    Migration(3, 'daily balances', [CreateTable('daily_balances')]),
+    Migration(4, 'identifier blocks', [CreateTable('id_blocks')]),
+    Migration(5, 'transfer idempotency keys', [
+        AddColumn('transactions', 'idempotency_key', 'VARCHAR(64)', then=[
+            "CREATE UNIQUE INDEX uq_transactions_user_key ON transactions (user_id, idempotency_key)",
+        ]),
+    ]),
+    Migration(6, 'hot query indexes', [
+        AddIndex('beneficiaries', 'idx_beneficiaries_user_account', ('user_id', 'account_number')),
+        AddColumn('cards', 'card_last4', "CHAR(4) NOT NULL DEFAULT ''", then=[
+            "UPDATE cards SET card_last4 = SUBSTR(card_number, -4)",
+        ]),
+        AddIndex('cards', 'idx_cards_user_last4', ('user_id', 'card_last4')),
+    ]),
+    Migration(7, 'cross-shard transfer outbox', [CreateTable('transfer_outbox'), CreateTable('transfer_credits')]),
+    # Databases that ran version 5 before keys were scoped per payer, or were
+    # bootstrapped with a column-level UNIQUE (named idempotency_key on MySQL)
+    Migration(8, 'idempotency keys per payer', [
+        AddIndex('transactions', 'uq_transactions_user_key', ('user_id', 'idempotency_key'), unique=True),
+        DropIndex('transactions', 'uq_transactions_idempotency_key'),
+        DropIndex('transactions', 'idempotency_key'),
+    ]),
+]
+
+# Queries on the request path, with representative parameters, that must be
+# answered through an index. Registry statements are given by name.
+HOT_QUERIES = [
+    ('login', ('someone',)),
+    ('account_info', (1,)),
+    ('beneficiaries', (1,)),
+    ('cards', (1,)),
+    ('debit_balance', (10, 1, 10, 1, '0000000000')),
+    ('transaction_by_key', (1, 'key')),
+    ('card_by_last4', (1, '1234')),
+    ('update_pin', ('0000', 1, '0000000000000000')),
+    ("""
+    SELECT transaction_id, amount, beneficiary_account, transaction_date FROM transactions
+    WHERE user_id = %s
+    ORDER BY transaction_date DESC, transaction_id DESC
+    LIMIT %s
+    """, (1, 51)),
+]
+
+
+def _applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def _ensure_table(db):
+    with db.transaction() as cursor:
+        db.backend.create_missing(cursor, 'schema_migrations', SCHEMA_MIGRATIONS.strip())
+
+
+def migrate(db, target=None, migrations=MIGRATIONS):
+    """Apply every pending migration up to target (default: all), returning the versions applied.
+
+    Each version runs in its own transaction. MySQL commits DDL implicitly,
+    so a version interrupted part way cannot be rolled back there; instead
+    every step checks the catalog first and skips work already done, which
+    makes rerunning an interrupted migration safe on every backend.
+    """
+    _ensure_table(db)
+    with db.transaction() as cursor:
+        done = _applied_versions(cursor)
+    applied = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version in done or (target is not None and migration.version > target):
+            continue
+        with db.transaction() as cursor:
+            for step in migration.steps:
+                if not step.applied(cursor, db.backend):
+                    for statement in step.statements(db.backend):
+                        cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s, %s, %s)",
+                           (migration.version, migration.name, datetime.now()))
+        applied.append(migration.version)
+    return applied
+
+
+def status(db, migrations=MIGRATIONS):
+    """(version, name, applied) for every known migration."""
+    _ensure_table(db)
+    with db.transaction() as cursor:
+        done = _applied_versions(cursor)
+    return [(m.version, m.name, m.version in done) for m in sorted(migrations, key=lambda m: m.version)]
+
+
+def explain_hot_queries(db, queries=HOT_QUERIES):
+    """Query plans for the hot queries as {query: [(step, full_scan), ...]}."""
+    plans = {}
+    with db.transaction() as cursor:
+        for query, params in queries:
+            sql = db.statements.sql.get(query, query)
+            label = query if query in db.statements.sql else ' '.join(query.split())
+            plans[label] = db.backend.explain(cursor, sql, params)
+    return plans
+
+
+def full_scans(plans):
+    """The hot queries whose plans read a whole table or index."""
+    return [query for query, steps in plans.items() if any(full for _, full in steps)]
+
+
+def main():
+    """Command line entry point: apply migrations, list them, or check hot query plans."""
+
+    parser = argparse.ArgumentParser(description="Versioned schema migrations.")
+    parser.add_argument('--sqlite', metavar='DB', help="Use an SQLite database file instead of MySQL")
+    sub = parser.add_subparsers(dest='command', required=True)
+    up = sub.add_parser('migrate', help="Apply pending migrations")
+    up.add_argument('--target', type=int, help="Stop after this version")
+    sub.add_parser('status', help="List migrations and whether each is applied")
+    sub.add_parser('explain', help="Show hot query plans; exit 1 if any reads a whole table")
+    args = parser.parse_args()
+
+    from database import Database
+    from backends import SQLiteBackend
+    db = Database(SQLiteBackend(args.sqlite)) if args.sqlite else Database()
+    try:
+        if args.command == 'migrate':
+            applied = migrate(db, args.target)
+            print(f"Applied {', '.join(map(str, applied))}" if applied else "Schema is up to date.")
+        elif args.command == 'status':
+            for version, name, applied in status(db):
+                print(f"{version:>4}  {'applied' if applied else 'pending':<8} {name}")
+        else:
+            plans = explain_hot_queries(db)
+            for query, steps in plans.items():
+                print(query)
+                for step, full in steps:
+                    print(f"    {'FULL SCAN ' if full else ''}{step}")
+            scans = full_scans(plans)
+            if scans:
+                print(f"{len(scans)} hot queries read a whole table: {', '.join(scans)}")
+                sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import csv
+import json
+import time
+from banking import BankSystem
+from backends import SQLiteBackend
+from database import Database
+
+def read_registrations(path):
+    """Stream registration rows from a CSV (with a header row) or JSONL file."""
+
+    with open(path, newline='') as f:
+        if path.endswith(('.jsonl', '.json')):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+def onboard(bank, rows, chunk_size=1000, report_every=10000):
+    """Bulk-register rows through the bank, printing progress and returning a summary."""
+
+    start = time.perf_counter()
+    total = registered = 0
+    failures = {}
+    for result in bank.register_users_bulk(rows, chunk_size=chunk_size):
+        total += 1
+        if result.ok:
+            registered += 1
+        else:
+            failures[result.reason] = failures.get(result.reason, 0) + 1
+        if report_every and total % report_every == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{total} rows, {total / elapsed:.0f} rows/sec")
+
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': total,
+        'registered': registered,
+        'failed': total - registered,
+        'failures': failures,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(total / elapsed, 1) if elapsed else 0.0,
+    }
+
+def main():
+    """Command line entry point for bulk customer migration."""
+
+    parser = argparse.ArgumentParser(description="Bulk-register users from a CSV or JSONL file.")
+    parser.add_argument('path', help="CSV or JSONL file with username, password, name, address, aadhaar, mobile")
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--sqlite', metavar='DB', help="Load into an SQLite database file instead of MySQL")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        db = Database(SQLiteBackend(args.sqlite))
+        db.bootstrap_schema()
+    else:
+        db = Database()
+    summary = onboard(BankSystem(db), read_registrations(args.path), chunk_size=args.chunk_size)
+    print(json.dumps(summary, indent=2))
+    db.close()
+
+if __name__ == "__main__":
+    main()
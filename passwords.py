@@ -0,0 +1,200 @@
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from cache import TTLCache
+
+_LEGACY_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _b64(data):
+    return base64.b64encode(data).decode().rstrip('=')
+
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class Sha256Hasher:
+    """The original unsalted SHA-256 scheme, kept only to verify old rows."""
+
+    name = 'sha256'
+
+    def hash(self, password):
+        return hashlib.sha256(password.encode()).hexdigest()
+
+    def identify(self, stored):
+        return _LEGACY_SHA256.match(stored) is not None
+
+    def verify(self, stored, password):
+        return hmac.compare_digest(stored, self.hash(password))
+
+    def needs_rehash(self, stored):
+        return True
+
+
+class ScryptHasher:
+    """Salted, memory-hard scrypt hashes stored as scrypt$n$r$p$salt$hash.
+
+    Cost grows with n (CPU and memory, 128 * n * r bytes) and p (parallel
+    lanes); stored hashes carry their own parameters so costs can be raised
+    without invalidating existing rows.
+    """
+
+    name = 'scrypt'
+
+    def __init__(self, n=2 ** 14, r=8, p=1, dklen=32, salt_bytes=16):
+        self.n, self.r, self.p = n, r, p
+        self.dklen = dklen
+        self.salt_bytes = salt_bytes
+
+    def _derive(self, password, salt, n, r, p, dklen):
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=dklen,
+                              maxmem=256 * n * r * p + 1024 * 1024)
+
+    def hash(self, password):
+        salt = os.urandom(self.salt_bytes)
+        key = self._derive(password, salt, self.n, self.r, self.p, self.dklen)
+        return f"scrypt${self.n}${self.r}${self.p}${_b64(salt)}${_b64(key)}"
+
+    def identify(self, stored):
+        return stored.startswith('scrypt$')
+
+    def verify(self, stored, password):
+        _, n, r, p, salt, key = stored.split('$')
+        key = _unb64(key)
+        derived = self._derive(password, _unb64(salt), int(n), int(r), int(p), len(key))
+        return hmac.compare_digest(derived, key)
+
+    def needs_rehash(self, stored):
+        _, n, r, p, _, _ = stored.split('$')
+        return (int(n), int(r), int(p)) != (self.n, self.r, self.p)
+
+
+def _verify_task(hashers, stored, password):
+    """Verify against whichever scheme produced the stored hash (runs on a pool worker)."""
+    for hasher in hashers:
+        if hasher.identify(stored):
+            return hasher.verify(stored, password), hasher.needs_rehash(stored)
+    return False, False
+
+
+def _reject_task(hashers, stored, password):
+    """Run the KDF against a dummy hash and report failure (runs on a pool worker)."""
+    _verify_task(hashers, stored, password)
+    return False, False
+
+
+def _hash_task(hasher, password):
+    return hasher.hash(password)
+
+
+class PasswordManager:
+    """Hashes and verifies passwords on a bounded worker pool, with login throttling and a verified-login cache.
+
+    The pool size caps how many KDF runs happen at once, so a burst of logins
+    queues instead of starving other sessions of CPU. Failed attempts per
+    username are rate limited before any KDF work is done, and successful
+    verifications are remembered for cache_ttl seconds under a keyed digest
+    of the credentials so repeat logins in a session skip the KDF.
+    """
+
+    def __init__(self, hasher=None, workers=None, use_processes=False, cache_ttl=300.0,
+                 max_failures=5, failure_window=60.0):
+        self.hasher = hasher or ScryptHasher()
+        self.legacy = [Sha256Hasher()]
+        workers = workers or os.cpu_count() or 1
+        executor = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self.executor = executor(max_workers=workers)
+        self.verified = TTLCache(maxsize=100000, ttl=cache_ttl)
+        self.max_failures = max_failures
+        self.failure_window = failure_window
+        self._failures = {}
+        self._lock = threading.Lock()
+        self._secret = os.urandom(32)
+        self._dummy = None
+
+    def submit_hash(self, password):
+        """Hash a new password on the pool, returning a Future."""
+        return self.executor.submit(_hash_task, self.hasher, password)
+
+    def hash(self, password):
+        """Hash a new password with the current scheme and cost."""
+        return self.submit_hash(password).result()
+
+    def hash_many(self, passwords):
+        """Hash a batch of passwords across the whole pool."""
+        return list(self.executor.map(_hash_task, [self.hasher] * len(passwords), passwords))
+
+    def submit_verify(self, stored, password):
+        """Verify on the pool; the Future resolves to (ok, needs_rehash)."""
+        return self.executor.submit(_verify_task, [self.hasher] + self.legacy, stored, password)
+
+    def verify(self, stored, password):
+        """Return (ok, needs_rehash) for a stored hash in any supported scheme."""
+        return self.submit_verify(stored, password).result()
+
+    def submit_verify_or_dummy(self, stored, password):
+        """submit_verify, where stored is None for a username that does not exist.
+
+        Unknown usernames still pay for one KDF run, against dummy_hash, and
+        never verify, so login time does not reveal which usernames exist.
+        """
+        if stored is None:
+            return self.executor.submit(_reject_task, [self.hasher], self.dummy_hash, password)
+        return self.submit_verify(stored, password)
+
+    def verify_or_dummy(self, stored, password):
+        """verify, where stored is None for a username that does not exist; see submit_verify_or_dummy."""
+        return self.submit_verify_or_dummy(stored, password).result()
+
+    @property
+    def dummy_hash(self):
+        """Hash of a random secret in the current scheme, verified against for unknown usernames."""
+        if self._dummy is None:
+            self._dummy = self.hash(os.urandom(16).hex())
+        return self._dummy
+
+    def session_key(self, username, password):
+        """Keyed digest of the credentials used to index the verified-login cache."""
+        return hmac.new(self._secret, f"{username}\0{password}".encode(), hashlib.sha256).hexdigest()
+
+    def throttled(self, username):
+        """True if the username has used up its failed attempts for the current window."""
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._failures.get(username)
+            if not attempts:
+                return False
+            while attempts and attempts[0] <= now - self.failure_window:
+                attempts.popleft()
+            if not attempts:
+                del self._failures[username]
+                return False
+            return len(attempts) >= self.max_failures
+
+    def record_failure(self, username):
+        """Count a failed login for the username."""
+        now = time.monotonic()
+        with self._lock:
+            if len(self._failures) > 100000:
+                # Forget usernames whose last failure has aged out of the window
+                stale = [name for name, attempts in self._failures.items()
+                         if attempts[-1] <= now - self.failure_window]
+                for name in stale:
+                    del self._failures[name]
+            self._failures.setdefault(username, deque()).append(now)
+
+    def record_success(self, username):
+        """Clear a username's failed attempts."""
+        with self._lock:
+            self._failures.pop(username, None)
+
+    def close(self):
+        """Shut down the worker pool."""
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,358 @@
+import bisect
+import hashlib
+import itertools
+from datetime import datetime
+from backends import table_statement
+from banking import BankSystem, RegistrationResult, TransferResult
+from cache import TTLCache
+from identifiers import IdentifierAllocator
+from passwords import PasswordManager
+
+# Lives only in the directory database: which user_id a username or account
+# number belongs to, and the shard that user was placed on at registration.
+DIRECTORY_SCHEMA = """
+CREATE TABLE shard_directory (
+    username VARCHAR(20) PRIMARY KEY,
+    user_id INT UNIQUE NOT NULL,
+    account_number VARCHAR(10) UNIQUE NOT NULL,
+    shard VARCHAR(50) NOT NULL
+)
+"""
+
+DIRECTORY_STATEMENTS = {
+    'directory_by_username': "SELECT user_id, shard FROM shard_directory WHERE username = %s",
+    'directory_by_account': "SELECT user_id, shard FROM shard_directory WHERE account_number = %s",
+    'directory_by_user': "SELECT user_id, shard FROM shard_directory WHERE user_id = %s",
+    'claim_username': "INSERT INTO shard_directory (username, user_id, account_number, shard) VALUES (%s, %s, %s, %s)",
+    'release_username': "DELETE FROM shard_directory WHERE username = %s",
+    'unplaced_users': "SELECT user_id FROM shard_directory WHERE shard = ''",
+    'place_user': "UPDATE shard_directory SET shard = %s WHERE user_id = %s",
+}
+
+SHARD_STATEMENTS = {
+    'insert_user_with_id': """
+    INSERT INTO users (user_id, username, password, name, address, aadhaar, mobile, account_number, balance)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """,
+    'insert_outbox': """
+    INSERT INTO transfer_outbox (user_id, payee_user_id, account_number, amount, created_at)
+    VALUES (%s, %s, %s, %s, %s)
+    """,
+    'pending_outbox': """
+    SELECT outbox_id, payee_user_id, amount FROM transfer_outbox
+    WHERE delivered_at IS NULL ORDER BY outbox_id LIMIT %s
+    """,
+    'mark_delivered': "UPDATE transfer_outbox SET delivered_at = %s WHERE outbox_id = %s",
+    'credit_by_key': "SELECT credit_key FROM transfer_credits WHERE credit_key = %s",
+    'insert_credit': "INSERT INTO transfer_credits (credit_key, user_id, amount, applied_at) VALUES (%s, %s, %s, %s)",
+    'credit_balance': "UPDATE users SET balance = balance + %s WHERE user_id = %s",
+}
+
+
+def _hash(value):
+    """Stable 64 bit hash; Python's hash() is salted per process."""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hash ring placing each key on one of a set of named shards.
+
+    Each shard owns vnodes points on the ring, which keeps the load even and
+    means adding a shard only moves the keys that land on its new points.
+    """
+
+    def __init__(self, names, vnodes=128):
+        points = sorted((_hash(f"{name}#{i}"), name) for name in names for i in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def shard_for(self, key):
+        """Name of the shard that owns key."""
+        i = bisect.bisect(self._points, _hash(str(key))) % len(self._points)
+        return self._names[i]
+
+
+class ShardBank(BankSystem):
+    """BankSystem over one shard; debits to accounts held by the bank also queue a credit in its outbox."""
+
+    def __init__(self, name, router, db, cache, passwords, ids):
+        super().__init__(db, cache, passwords, ids)
+        self.name = name
+        self.router = router
+        for statement, sql in SHARD_STATEMENTS.items():
+            db.statements.register(statement, sql)
+
+    def _record_debits(self, debits, when, payees=None):
+        if payees is None:
+            payees = self.router.payees(account_number for _, account_number, _ in debits)
+        rows = [(user_id, payees[account_number], account_number, amount, when)
+                for user_id, account_number, amount in debits if payees[account_number]]
+        if rows:
+            self.db.statement('insert_outbox').executemany(rows)
+
+    def _insert_user(self, user_id, username, hashed_password, name, address, aadhaar, mobile, account_number, cards):
+        """Insert a user under a user_id assigned elsewhere, with its debit and credit card."""
+        with self.db.transaction():
+            params = (user_id, username, hashed_password, name, address, aadhaar, mobile, account_number, 1000.0)
+            self.db.statement('insert_user_with_id').execute(params)
+            insert_card = self.db.statement('insert_card')
+            for card_number, card_type in zip(cards, ('Debit', 'Credit')):
+                insert_card.execute(self._card_row(user_id, card_number, card_type))
+        self.db.mark_written(username)
+
+    def _apply_credit(self, credit_key, user_id, amount):
+        """Credit a payee once per credit_key, returning False if it was already applied."""
+        try:
+            with self.db.transaction():
+                seen = self.db.statement('credit_by_key')
+                seen.execute((credit_key,))
+                if seen.fetchone():
+                    return False
+                self.db.statement('insert_credit').execute((credit_key, user_id, amount, datetime.now()))
+                self.db.statement('credit_balance').execute((amount, user_id))
+            return True
+        finally:
+            self._invalidate(user_id, 'account')
+
+
+class ShardedBankSystem:
+    """The BankSystem interface over users spread across several databases.
+
+    ``shards`` maps shard names to Database objects and ``directory`` is a
+    separate small Database holding the username and account number
+    directory and the identifier blocks. user_ids come from the directory's
+    allocator so they are unique across shards. The hash ring picks a new
+    user's shard, which the directory then records; every later request
+    routes through the directory, so adding a shard to ``shards`` only sends
+    it new users and never strands existing ones. Users are not moved
+    between shards.
+
+    A transfer debits the payer on the payer's shard. When the beneficiary
+    account is held by the bank, the same transaction writes a row to that
+    shard's transfer_outbox. relay() later credits the payee on its own
+    shard. Each outbox row is credited once, keyed by shard and outbox_id in
+    the payee's transfer_credits table, so relaying again after a crash is
+    safe. Beneficiaries outside the bank are only debited, as in BankSystem.
+    """
+
+    def __init__(self, shards, directory, cache=None, passwords=None, ids=None, vnodes=128):
+        self.directory = directory
+        self.cache = cache if cache is not None else TTLCache()
+        self.passwords = passwords or PasswordManager()
+        self.ids = ids or IdentifierAllocator(directory)
+        self.ring = HashRing(shards, vnodes)
+        self.shards = {name: ShardBank(name, self, db, self.cache, self.passwords, self.ids)
+                       for name, db in shards.items()}
+        self.errors = directory.errors + tuple(error for db in shards.values() for error in db.errors)
+        # Directory entries never change once written, so they are cached for longer.
+        # Misses are never cached, since the key may be registered at any moment.
+        self._lookups = TTLCache(maxsize=100000, ttl=300.0)
+        for name, sql in DIRECTORY_STATEMENTS.items():
+            directory.statements.register(name, sql)
+
+    def bootstrap(self):
+        """Create any missing tables in the directory and on every shard.
+
+        A directory from before shards were recorded gains the shard column,
+        filled in with each user's ring placement, which is where the user
+        lives as long as the shard set has not changed since.
+        """
+        with self.directory.transaction() as cursor:
+            backend = self.directory.backend
+            backend.create_missing(cursor, 'shard_directory', DIRECTORY_SCHEMA.strip())
+            backend.create_missing(cursor, 'id_blocks', table_statement('id_blocks'))
+            if not backend.has_column(cursor, 'shard_directory', 'shard'):
+                cursor.execute("ALTER TABLE shard_directory ADD COLUMN shard VARCHAR(50) NOT NULL DEFAULT ''")
+            unplaced = self.directory.statement('unplaced_users')
+            unplaced.execute()
+            placements = [(self.ring.shard_for(row['user_id']), row['user_id']) for row in unplaced.fetchall()]
+            if placements:
+                self.directory.statement('place_user').executemany(placements)
+        for bank in self.shards.values():
+            bank.db.bootstrap_schema()
+
+    def shard_for(self, user_id):
+        """The ShardBank holding user_id, as recorded in the directory; database errors propagate.
+
+        An unknown user_id goes to the shard a new user would, where it is
+        simply not found.
+        """
+        entry = self._lookup('directory_by_user', user_id)
+        return self.shards[entry['shard'] if entry else self.ring.shard_for(user_id)]
+
+    def _lookup(self, name, value):
+        """Directory row ({user_id, shard}) for a key, or None; database errors propagate."""
+        def load():
+            with self.directory.transaction():
+                stmt = self.directory.statement(name)
+                stmt.execute((value,))
+                row = stmt.fetchone()
+            return dict(row) if row else None
+        return self._lookups.get_or_load((name, value), load)
+
+    def user_id_for(self, username):
+        """user_id registered under username, or None."""
+        entry = self._lookup('directory_by_username', username)
+        return entry['user_id'] if entry else None
+
+    def payees(self, account_numbers):
+        """{account_number: user_id} for the given accounts, with 0 for accounts outside the bank."""
+        entries = {account_number: self._lookup('directory_by_account', account_number)
+                   for account_number in set(account_numbers)}
+        return {account_number: entry['user_id'] if entry else 0 for account_number, entry in entries.items()}
+
+    def _register(self, username, password, name, address, aadhaar, mobile):
+        """Register one validated user, returning None on success or the reason it failed."""
+        try:
+            if self.user_id_for(username) is not None:
+                return 'Username already exists.'
+            hashed_password = self.passwords.hash(password)
+            user_id = self.ids.user_ids(1)[0]
+            account_number = self.ids.account_number()
+            cards = self.ids.card_numbers(2)
+            bank = self.shards[self.ring.shard_for(user_id)]
+            # Claim the username first; its unique key turns away a concurrent registration on another shard
+            with self.directory.transaction():
+                self.directory.statement('claim_username').execute((username, user_id, account_number, bank.name))
+        except self.directory.errors as e:
+            return f"database error: {e}"
+
+        try:
+            bank._insert_user(user_id, username, hashed_password, name, address, aadhaar, mobile, account_number, cards)
+        except bank.db.errors as e:
+            # Give the username back so it can be registered again
+            self.directory.execute_statement('release_username', (username,))
+            return f"database error: {e}"
+        return None
+
+    def register_user(self, username, password, name, address, aadhaar, mobile):
+        """Register a new user, on the shard the ring gives its new user_id, with one credit and one debit card."""
+        error = self._register(username, password, name, address, aadhaar, mobile)
+        if error:
+            print(error if error.startswith('Username') else f"Error occurred: {error}")
+            return False
+        return True
+
+    def register_users_bulk(self, rows, chunk_size=1000):
+        """Register many users, yielding a RegistrationResult per row.
+
+        Rows are validated a chunk at a time and then registered one by one,
+        since consecutive users land on different shards.
+        """
+        from validation import validate_registrations
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            for row, error in zip(chunk, validate_registrations(chunk)):
+                username = row.get('username') if isinstance(row, dict) else None
+                if error is None:
+                    error = self._register(username, row['password'], row['name'], row['address'],
+                                           row['aadhaar'], row['mobile'])
+                yield RegistrationResult(username, error is None, error)
+
+    def login(self, username, password):
+        """Authenticate user on their shard and return user_id if succesful."""
+        try:
+            user_id = self.user_id_for(username)
+        except self.directory.errors as e:
+            print(f"Database error: {e}")
+            return None
+        if user_id is None:
+            self.passwords.verify_or_dummy(None, password)
+            self.passwords.record_failure(username)
+            return None
+        try:
+            bank = self.shard_for(user_id)
+        except self.directory.errors as e:
+            print(f"Database error: {e}")
+            return None
+        return bank.login(username, password)
+
+    def get_account_info(self, user_id):
+        return self.shard_for(user_id).get_account_info(user_id)
+
+    def get_beneficiaries(self, user_id):
+        return self.shard_for(user_id).get_beneficiaries(user_id)
+
+    def get_cards(self, user_id):
+        return self.shard_for(user_id).get_cards(user_id)
+
+    def add_beneficiaries(self, user_id, name, account_number):
+        return self.shard_for(user_id).add_beneficiaries(user_id, name, account_number)
+
+    def update_account_info(self, user_id, name, address, mobile):
+        return self.shard_for(user_id).update_account_info(user_id, name, address, mobile)
+
+    def change_card_pin(self, user_id, card_number_last4, new_pin):
+        return self.shard_for(user_id).change_card_pin(user_id, card_number_last4, new_pin)
+
+    def add_credit_card(self, user_id):
+        return self.shard_for(user_id).add_credit_card(user_id)
+
+    def get_transactions(self, user_id, since=None, until=None, limit=50, cursor=None):
+        return self.shard_for(user_id).get_transactions(user_id, since, until, limit, cursor)
+
+    def stream_transactions(self, user_id, since=None, until=None, batch_size=500):
+        return self.shard_for(user_id).stream_transactions(user_id, since, until, batch_size)
+
+    def transfer_funds(self, user_id, account_number, amount, idempotency_key=None):
+        """Debit the payer on their shard, then try to deliver any credit to the payee straight away."""
+        try:
+            bank = self.shard_for(user_id)
+            ok = self._apply_transfer(user_id, account_number, amount, idempotency_key)
+        except self.errors as e:
+            print(f"Transfer failed: {e}")
+            return False
+        if ok:
+            self.relay(bank.name)
+        return ok
+
+    def _apply_transfer(self, user_id, account_number, amount, idempotency_key=None):
+        """transfer_funds without the error handling or relay, for callers that retry."""
+        # Resolve the payee before the shard transaction takes its row locks
+        payees = self.payees([account_number])
+        return self.shard_for(user_id)._apply_transfer(user_id, account_number, amount, idempotency_key, payees)
+
+    def transfer_funds_bulk(self, batch, chunk_size=1000):
+        """Apply many transfers, one transaction per shard per chunk, yielding a TransferResult per row."""
+        rows = iter(batch)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            try:
+                payees = self.payees(account_number for _, account_number, _ in chunk)
+                by_shard = {}
+                for i, row in enumerate(chunk):
+                    by_shard.setdefault(self.shard_for(row[0]).name, []).append(i)
+            except self.directory.errors as e:
+                print(f"Bulk transfer chunk failed: {e}")
+                yield from (TransferResult(*row, False, 'database error') for row in chunk)
+                continue
+            results = [None] * len(chunk)
+            for name, positions in by_shard.items():
+                shard_chunk = [chunk[i] for i in positions]
+                for i, result in zip(positions, self.shards[name]._transfer_chunk(shard_chunk, payees)):
+                    results[i] = result
+                self.relay(name)
+            yield from results
+
+    def relay(self, shard=None, limit=500):
+        """Deliver pending outbox credits from one shard (default: all), returning how many were applied.
+
+        Credits that fail stay pending and are retried by the next relay.
+        """
+        applied = 0
+        for bank in [self.shards[shard]] if shard else self.shards.values():
+            for row in bank.db.execute_statement('pending_outbox', (limit,), fetch=True) or []:
+                credit_key = f"{bank.name}:{row['outbox_id']}"
+                try:
+                    payee = self.shard_for(row['payee_user_id'])
+                    applied += payee._apply_credit(credit_key, row['payee_user_id'], row['amount'])
+                except self.errors as e:
+                    print(f"Credit {credit_key} not delivered: {e}")
+                    continue
+                bank.db.execute_statement('mark_delivered', (datetime.now(), row['outbox_id']))
+        return applied
@@ -0,0 +1,141 @@
+import threading
+import weakref
+from instrumentation import InstrumentedCursor
+
+def daily_rollup_query(backend):
+    """Upsert that folds debits into a user's daily_balances row and stamps the closing balance.
+
+    Params are (day, debit_count, total_amount, user_id); it must run in the
+    same transaction as, and after, the balance update it summarises.
+    """
+    # The derived table supplies MySQL's "new" row alias; SQLite needs the WHERE so ON parses as the upsert
+    upsert = backend.upsert_clause('daily_balances', ('user_id', 'day'), increment=('debit_count', 'total_amount'),
+                                   replace=('closing_balance',), derived=True)
+    return f"""
+    INSERT INTO daily_balances (user_id, day, debit_count, total_amount, closing_balance)
+    SELECT * FROM (
+        SELECT user_id, %s AS day, %s AS debit_count, %s AS total_amount, balance AS closing_balance
+        FROM users WHERE user_id = %s
+    ) AS new WHERE true
+    {upsert}
+    """
+
+# Every fixed statement the bank issues, by name. Values are SQL text or a
+# callable that renders it for a backend. Statements whose shape depends on
+# the input (IN lists, multi-row VALUES, optional filters) stay inline.
+STATEMENTS = {
+    'user_id_by_username': "SELECT user_id FROM users WHERE username = %s",
+    'login': "SELECT user_id, password FROM users WHERE username = %s",
+    'rehash_password': "UPDATE users SET password = %s WHERE user_id = %s AND password = %s",
+    'insert_user': """
+    INSERT INTO users (username, password, name, address, aadhaar, mobile, account_number, balance)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """,
+    'insert_card': """
+    INSERT INTO cards (user_id, card_number, card_last4, card_type, pin, cvv)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    """,
+    'account_info': "SELECT name, address, aadhaar, mobile, balance FROM users WHERE user_id = %s",
+    'beneficiaries': "SELECT name, account_number FROM beneficiaries WHERE user_id = %s",
+    'cards': "SELECT card_number, card_type, pin, cvv FROM cards WHERE user_id = %s",
+    'insert_beneficiary': "INSERT INTO beneficiaries (user_id, name, account_number) VALUES (%s, %s, %s)",
+    # NULL leaves a field unchanged
+    'update_account': """
+    UPDATE users SET name = COALESCE(%s, name), address = COALESCE(%s, address), mobile = COALESCE(%s, mobile)
+    WHERE user_id = %s
+    """,
+    # Debit only if the beneficiary exists and the balance covers the amount
+    'debit_balance': """
+    UPDATE users SET balance = balance - %s
+    WHERE user_id = %s AND balance >= %s
+    AND EXISTS (SELECT 1 FROM beneficiaries WHERE user_id = %s AND account_number = %s)
+    """,
+    'debit_balance_unchecked': "UPDATE users SET balance = balance - %s WHERE user_id = %s",
+    'insert_transaction': """
+    INSERT INTO transactions (user_id, amount, beneficiary_account, transaction_date, idempotency_key)
+    VALUES (%s, %s, %s, %s, %s)
+    """,
+    'transaction_by_key': """
+    SELECT beneficiary_account, amount FROM transactions WHERE user_id = %s AND idempotency_key = %s
+    """,
+    'daily_rollup': daily_rollup_query,
+    'card_by_last4': "SELECT card_number FROM cards WHERE user_id = %s AND card_last4 = %s",
+    'update_pin': "UPDATE cards SET pin = %s WHERE user_id = %s AND card_number = %s",
+}
+
+
+class PreparedStatement:
+    """A named statement bound to one connection's prepared cursor."""
+
+    def __init__(self, registry, name, cursor):
+        self._registry = registry
+        self.name = name
+        self.sql = registry.sql[name]
+        self._cursor = cursor
+
+    def execute(self, params=()):
+        self._registry.count(self.name)
+        self._cursor.execute(self.sql, params)
+
+    def executemany(self, seq_of_params):
+        self._registry.count(self.name)
+        self._cursor.executemany(self.sql, seq_of_params)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchone(self):
+        # Drain the result so the long-lived cursor holds no open statement
+        rows = self._cursor.fetchall()
+        return rows[0] if rows else None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class StatementRegistry:
+    """Named SQL statements, prepared once per pooled connection and counted per execution.
+
+    Prepared cursors are kept per connection and dropped with it. They are
+    rebuilt if the backend reports a new server session on the same
+    connection object, since a reconnect forgets server-side statements.
+    """
+
+    def __init__(self, backend, statements=None):
+        self.backend = backend
+        self.sql = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._prepared = weakref.WeakKeyDictionary()
+        for name, sql in (STATEMENTS if statements is None else statements).items():
+            self.register(name, sql)
+
+    def register(self, name, sql):
+        """Add or replace a named statement; sql may be a callable taking the backend."""
+        self.sql[name] = sql(self.backend) if callable(sql) else sql
+        self.counts.setdefault(name, 0)
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def cursor(self, conn, name, instrument=None):
+        """The prepared statement called name on conn, preparing it on first use."""
+        session = self.backend.session_id(conn)
+        with self._lock:
+            cached_session, cursors = self._prepared.get(conn, (None, None))
+            if cursors is None or cached_session != session:
+                cursors = {}
+                self._prepared[conn] = (session, cursors)
+            cursor = cursors.get(name)
+            if cursor is None:
+                cursor = cursors[name] = self.backend.prepared_cursor(conn)
+        if instrument is not None:
+            cursor = InstrumentedCursor(cursor, instrument)
+        return PreparedStatement(self, name, cursor)
+
+    def snapshot(self):
+        """Execution counts per statement, busiest first."""
+        with self._lock:
+            counts = dict(self.counts)
+        return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
@@ -0,0 +1,24 @@
+from decimal import Decimal
+import pytest
+from analytics import backfill_daily_balances
+from conftest import PAYEE, register
+
+
+def test_backfill_closes_each_day_at_the_running_balance(bank):
+    user_id = register(bank, 'daily1')
+    assert bank.transfer_funds(user_id, PAYEE, 100)
+    assert bank.transfer_funds(user_id, PAYEE, 50)
+
+    assert backfill_daily_balances(bank.db, users_per_chunk=1) == 1
+
+    row, = bank.db.execute_query("SELECT * FROM daily_balances WHERE user_id = %s", (user_id,), fetch=True)
+    assert row['debit_count'] == 2
+    assert Decimal(str(row['closing_balance'])) == Decimal('850')
+
+
+def test_backfill_raises_database_errors(bank):
+    register(bank, 'daily2')
+    bank.db.execute_query("ALTER TABLE transactions RENAME TO transactions_gone")
+
+    with pytest.raises(bank.db.backend.errors):
+        backfill_daily_balances(bank.db)
@@ -0,0 +1,56 @@
+import asyncio
+from async_banking import AsyncBankSystem, AsyncConnectionPool, AsyncDatabase, AsyncLocalBackend
+from backends import SQLiteBackend
+from database import Database
+from migrations import MIGRATIONS, status
+
+
+def local_backend(tmp_path):
+    return AsyncLocalBackend(SQLiteBackend(str(tmp_path / 'async.db')))
+
+
+def test_release_drops_a_broken_connection_and_frees_its_slot(tmp_path):
+    async def scenario():
+        pool = AsyncConnectionPool(local_backend(tmp_path), size=1, timeout=1.0)
+        conn = await pool.acquire()
+        conn.close()
+        await pool.release(conn)
+
+        replacement = await pool.acquire()
+        assert replacement is not conn
+        assert pool.snapshot()['open'] == 1
+        await pool.release(replacement)
+        pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_bootstrap_schema_applies_migrations(tmp_path):
+    backend = local_backend(tmp_path)
+
+    async def scenario():
+        db = AsyncDatabase(backend)
+        await db.bootstrap_schema()
+        db.close()
+
+    asyncio.run(scenario())
+    db = Database(backend.backend)
+    assert all(applied for _, _, applied in status(db))
+    assert len(status(db)) == len(MIGRATIONS)
+    db.close()
+
+
+def test_cached_read_overlapping_a_write_is_not_stored(tmp_path):
+    async def scenario():
+        db = AsyncDatabase(local_backend(tmp_path))
+        bank = AsyncBankSystem(db)
+
+        async def load():
+            bank._invalidate(1, 'account')
+            return {'balance': 1}
+
+        assert await bank._cached(('account', 1), load) == {'balance': 1}
+        assert ('account', 1) not in bank.cache._data
+        db.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,62 @@
+import threading
+from cache import TTLCache
+from conftest import PAYEE, register
+
+
+def load_in_thread(cache, key, value):
+    """Start a get_or_load that blocks until release is set; returns (thread, started, release, results)."""
+    started, release, results = threading.Event(), threading.Event(), []
+
+    def loader():
+        started.set()
+        release.wait(1.0)
+        return value
+
+    thread = threading.Thread(target=lambda: results.append(cache.get_or_load(key, loader)), daemon=True)
+    thread.start()
+    assert started.wait(1.0)
+    return thread, release, results
+
+
+def test_load_overlapping_invalidate_is_returned_but_not_stored():
+    cache = TTLCache()
+    thread, release, results = load_in_thread(cache, 'k', 'before write')
+
+    cache.invalidate('k')
+    release.set()
+    thread.join(1.0)
+
+    assert results == ['before write']
+    assert cache.get('k') is None
+    assert cache.get_or_load('k', lambda: 'after write') == 'after write'
+    assert cache.get('k') == 'after write'
+
+
+def test_load_overlapping_clear_is_not_stored():
+    cache = TTLCache()
+    thread, release, results = load_in_thread(cache, 'k', 'before write')
+
+    cache.clear()
+    release.set()
+    thread.join(1.0)
+
+    assert results == ['before write']
+    assert cache.get('k') is None
+
+
+def test_account_read_overlapping_a_transfer_is_not_cached(bank, monkeypatch):
+    user_id = register(bank, 'overlap1')
+    bank.cache.clear()
+    real_read = bank.db.execute_read
+
+    def read_then_transfer(name, params, session=None):
+        rows = real_read(name, params, session=session)
+        if name == 'account_info':
+            assert bank.transfer_funds(user_id, PAYEE, 100)
+        return rows
+
+    monkeypatch.setattr(bank.db, 'execute_read', read_then_transfer)
+    assert bank.get_account_info(user_id)['balance'] == 1000
+    monkeypatch.undo()
+
+    assert bank.get_account_info(user_id)['balance'] == 900
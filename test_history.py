@@ -0,0 +1,33 @@
+import pytest
+from conftest import PAYEE, register
+
+
+def test_history_pages_and_stream_agree(bank):
+    user_id = register(bank, 'history1')
+    for amount in range(1, 8):
+        assert bank.transfer_funds(user_id, PAYEE, amount)
+
+    pages, cursor = [], None
+    while True:
+        rows, cursor = bank.get_transactions(user_id, limit=3, cursor=cursor)
+        pages.append([row['amount'] for row in rows])
+        if cursor is None:
+            break
+
+    assert pages == [[7, 6, 5], [4, 3, 2], [1]]
+    assert [row['amount'] for row in bank.stream_transactions(user_id, batch_size=2)] == [1, 2, 3, 4, 5, 6, 7]
+
+
+def test_stream_raises_database_errors(bank):
+    with pytest.raises(bank.db.backend.errors):
+        list(bank.db.stream_query("SELECT * FROM no_such_table"))
+    # The connection went back to the pool
+    assert bank.db.pool.snapshot()['idle'] == bank.db.pool.snapshot()['open']
+
+
+def test_page_query_raises_database_errors(bank):
+    user_id = register(bank, 'history2')
+    bank.db.execute_query("ALTER TABLE transactions RENAME TO transactions_gone")
+
+    with pytest.raises(bank.db.backend.errors):
+        bank.get_transactions(user_id)
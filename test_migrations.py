@@ -0,0 +1,85 @@
+import pytest
+from backends import SQLiteBackend
+from database import Database
+from migrations import explain_hot_queries, full_scans, migrate, status
+
+# The four tables as the schema file first shipped them, before any migration
+ORIGINAL_SCHEMA = """
+CREATE TABLE users (
+    user_id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(20) UNIQUE NOT NULL,
+    password VARCHAR(64) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    address VARCHAR(200) NOT NULL,
+    aadhaar VARCHAR(12) NOT NULL,
+    mobile VARCHAR(10) NOT NULL,
+    account_number VARCHAR(10) UNIQUE NOT NULL,
+    balance DECIMAL(10, 2) DEFAULT 100.00
+);
+
+CREATE TABLE cards (
+    card_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    card_number VARCHAR(16) UNIQUE NOT NULL,
+    card_type ENUM('Debit','Credit') NOT NULL,
+    pin VARCHAR(4) NOT NULL,
+    cvv VARCHAR(3) NOT NULL,
+    FOREIGN KEY(user_id) REFERENCES users(user_id)
+);
+
+CREATE TABLE transactions (
+    transaction_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    amount DECIMAL(10, 2) NOT NULL,
+    beneficiary_account VARCHAR(10) NOT NULL,
+    transaction_date DATETIME NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(user_id)
+);
+
+CREATE TABLE beneficiaries (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    account_number VARCHAR(10) NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(user_id)
+);
+"""
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(SQLiteBackend(str(tmp_path / 'bank.db')))
+    yield db
+    db.close()
+
+
+def pending(db):
+    return [version for version, _, applied in status(db) if not applied]
+
+
+def test_bootstrap_serves_hot_queries_from_indexes(db):
+    db.bootstrap_schema()
+    assert full_scans(explain_hot_queries(db)) == []
+    assert pending(db) == []
+
+
+def test_bootstrap_is_repeatable(db):
+    db.bootstrap_schema()
+    db.bootstrap_schema()
+    assert migrate(db) == []
+
+
+def test_bootstrap_migrates_original_schema(db, tmp_path):
+    original = tmp_path / 'original.sql'
+    original.write_text(ORIGINAL_SCHEMA)
+    db.bootstrap_schema(str(original))
+    db.execute_query("INSERT INTO users (username, password, name, address, aadhaar, mobile, account_number) "
+                     "VALUES ('someone', 'x', 'Some One', 'Somewhere', '123412341234', '9999999999', '1234567890')")
+    db.execute_query("INSERT INTO cards (user_id, card_number, card_type, pin, cvv) "
+                     "VALUES (1, '4000000000001234', 'Debit', '1111', '123')")
+
+    db.bootstrap_schema()
+
+    assert pending(db) == []
+    assert db.execute_query("SELECT card_last4 FROM cards", fetch=True) == [{'card_last4': '1234'}]
+    assert full_scans(explain_hot_queries(db)) == []
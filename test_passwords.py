@@ -0,0 +1,55 @@
+import hashlib
+from conftest import register
+
+
+def count_kdf_runs(passwords, monkeypatch):
+    """Count scrypt derivations from here on; returns a list that grows by one per run."""
+    runs = []
+    derive = passwords.hasher._derive
+    monkeypatch.setattr(passwords.hasher, '_derive', lambda *args: runs.append(1) or derive(*args))
+    return runs
+
+
+def test_legacy_sha256_password_is_rehashed_on_login(bank):
+    user_id = register(bank, 'legacy1')
+    legacy = hashlib.sha256(b'secret123').hexdigest()
+    bank.db.execute_query("UPDATE users SET password = %s WHERE user_id = %s", (legacy, user_id))
+    bank.passwords.verified.clear()
+
+    assert bank.login('legacy1', 'secret123') == user_id
+
+    stored = bank.db.execute_query("SELECT password FROM users WHERE user_id = %s", (user_id,), fetch=True)
+    assert stored[0]['password'].startswith('scrypt$')
+    bank.passwords.verified.clear()
+    assert bank.login('legacy1', 'secret123') == user_id
+
+
+def test_unknown_username_still_runs_the_kdf(bank, monkeypatch):
+    bank.passwords.dummy_hash
+    runs = count_kdf_runs(bank.passwords, monkeypatch)
+
+    assert bank.login('nobody1', 'secret123') is None
+    assert len(runs) == 1
+
+
+def test_failed_logins_throttle_only_that_username(bank):
+    alice = register(bank, 'throttle1')
+    bob = register(bank, 'throttle2')
+    bank.passwords.verified.clear()
+    for _ in range(bank.passwords.max_failures):
+        assert bank.login('throttle1', 'wrong-password') is None
+
+    assert bank.login('throttle1', 'secret123') is None
+    assert bank.login('throttle2', 'secret123') == bob
+    bank.passwords.record_success('throttle1')
+    assert bank.login('throttle1', 'secret123') == alice
+
+
+def test_repeat_login_is_served_from_the_verified_cache(bank, monkeypatch):
+    user_id = register(bank, 'cached1')
+    runs = count_kdf_runs(bank.passwords, monkeypatch)
+
+    assert bank.login('cached1', 'secret123') == user_id
+    assert runs == []
+    assert bank.login('cached1', 'wrong-password') is None
+    assert len(runs) == 1
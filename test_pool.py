@@ -0,0 +1,86 @@
+import threading
+import time
+import pytest
+from backends import SQLiteBackend
+from database import ConnectionPool, PoolTimeout
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / 'pool.db'))
+
+
+def acquire_in_thread(pool):
+    """Start a thread waiting on pool.acquire(); returns the thread and a list that receives the connection."""
+    got = []
+    thread = threading.Thread(target=lambda: got.append(pool.acquire()), daemon=True)
+    thread.start()
+    return thread, got
+
+
+def test_pool_never_opens_more_than_size(backend):
+    pool = ConnectionPool(backend, size=2, timeout=0.1)
+    held = [pool.acquire(), pool.acquire()]
+
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    stats = pool.snapshot()
+    assert stats['open'] == 2
+    assert stats['timeouts'] == 1
+
+    for conn in held:
+        pool.release(conn)
+    pool.close()
+
+
+def test_waiter_takes_a_released_connection(backend):
+    pool = ConnectionPool(backend, size=1, timeout=5.0)
+    conn = pool.acquire()
+    thread, got = acquire_in_thread(pool)
+    time.sleep(0.05)
+
+    pool.release(conn)
+    thread.join(1.0)
+
+    assert got == [conn]
+    assert pool.snapshot()['open'] == 1
+    pool.release(conn)
+    pool.close()
+
+
+def test_waiter_wakes_when_a_broken_connection_frees_its_slot(backend):
+    pool = ConnectionPool(backend, size=1, timeout=5.0)
+    conn = pool.acquire()
+    thread, got = acquire_in_thread(pool)
+    time.sleep(0.05)
+
+    # A connection that died while checked out is discarded on release
+    conn.close()
+    pool.release(conn)
+    thread.join(1.0)
+
+    assert len(got) == 1 and got[0] is not conn
+    assert pool.snapshot()['open'] == 1
+    pool.release(got[0])
+    pool.close()
+
+
+def test_reconnecting_a_dead_idle_connection_keeps_its_slot(backend):
+    pool = ConnectionPool(backend, size=2, timeout=0.1, ping_interval=0.0)
+    other = pool.acquire()
+    conn = pool.acquire()
+    pool.release(conn)
+    # Dies while idle, so the next checkout's ping fails
+    conn.raw.close()
+
+    replacement = pool.acquire()
+
+    assert replacement is not conn
+    stats = pool.snapshot()
+    assert stats['reconnects'] == 1
+    assert stats['open'] == 2
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(replacement)
+    pool.release(other)
+    pool.close()
@@ -0,0 +1,50 @@
+import sqlite3
+import time
+from decimal import Decimal
+import pytest
+from backends import SQLiteBackend
+from banking import BankSystem
+from conftest import PAYEE, balance, register
+from database import Database
+
+
+@pytest.fixture
+def replicated(bank, tmp_path, passwords):
+    """(bank on a primary with one replica, user_id) where the replica is a snapshot taken after registration."""
+    user_id = register(bank, 'replicated')
+    primary_path, replica_path = bank.db.backend.path, str(tmp_path / 'replica.db')
+    with sqlite3.connect(primary_path) as source, sqlite3.connect(replica_path) as target:
+        source.backup(target)
+    db = Database(SQLiteBackend(primary_path), replicas=[SQLiteBackend(replica_path)], sticky_for=0.3)
+    yield BankSystem(db, passwords=passwords), user_id
+    db.close()
+
+
+def test_reads_go_to_the_replica(replicated):
+    bank, user_id = replicated
+    # Changed on the primary only, behind the bank's back
+    bank.db.execute_query("UPDATE users SET balance = 5 WHERE user_id = %s", (user_id,))
+
+    assert balance(bank, user_id) == Decimal('1000')
+
+
+def test_a_user_reads_their_own_writes_until_sticky_for_passes(replicated):
+    bank, user_id = replicated
+
+    assert bank.transfer_funds(user_id, PAYEE, 100)
+    assert balance(bank, user_id) == Decimal('900')
+
+    time.sleep(0.4)
+    # Back on the replica, which never received the transfer
+    assert balance(bank, user_id) == Decimal('1000')
+
+
+def test_reads_fail_over_to_the_primary(bank, tmp_path, passwords):
+    user_id = register(bank, 'failover')
+    missing = SQLiteBackend(str(tmp_path / 'no-such-dir' / 'replica.db'))
+    db = Database(SQLiteBackend(bank.db.backend.path), replicas=[missing], sticky_for=0.0)
+    replicated = BankSystem(db, passwords=passwords)
+
+    assert balance(replicated, user_id) == Decimal('1000')
+    assert db._healthy_replicas() == []
+    db.close()
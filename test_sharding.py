@@ -0,0 +1,123 @@
+from decimal import Decimal
+import pytest
+from backends import SQLiteBackend
+from conftest import balance
+from database import Database
+from sharding import ShardedBankSystem
+
+
+@pytest.fixture
+def sharded(tmp_path, passwords):
+    databases = {name: Database(SQLiteBackend(str(tmp_path / f'{name}.db'))) for name in ('east', 'west')}
+    directory = Database(SQLiteBackend(str(tmp_path / 'directory.db')))
+    bank = ShardedBankSystem(databases, directory, passwords=passwords)
+    bank.bootstrap()
+    yield bank
+    for db in list(databases.values()) + [directory]:
+        db.close()
+
+
+def account_number(bank, user_id):
+    shard = bank.shard_for(user_id)
+    rows = shard.db.execute_query("SELECT account_number FROM users WHERE user_id = %s", (user_id,), fetch=True)
+    return rows[0]['account_number']
+
+
+def users_on_two_shards(bank):
+    """Register users until two live on different shards, returning (payer, payee) user_ids."""
+    first = None
+    for i in range(50):
+        username = f'shard{i}'
+        assert bank.register_user(username, 'secret123', 'Test User', 'Test Street', '123412341234', '9876543210')
+        user_id = bank.login(username, 'secret123')
+        if first is None:
+            first = user_id
+        elif bank.shard_for(user_id) is not bank.shard_for(first):
+            return first, user_id
+    pytest.fail("every user landed on one shard")
+
+
+def test_cross_shard_transfer_credits_the_payee_once(sharded):
+    payer, payee = users_on_two_shards(sharded)
+    assert sharded.add_beneficiaries(payer, 'Payee', account_number(sharded, payee))
+
+    assert sharded.transfer_funds(payer, account_number(sharded, payee), 250)
+
+    assert balance(sharded, payer) == Decimal('750')
+    assert balance(sharded, payee) == Decimal('1250')
+    assert sharded.relay() == 0
+    assert balance(sharded, payee) == Decimal('1250')
+
+
+def test_relay_after_a_crash_does_not_credit_twice(sharded, monkeypatch):
+    payer, payee = users_on_two_shards(sharded)
+    payee_account = account_number(sharded, payee)
+    assert sharded.add_beneficiaries(payer, 'Payee', payee_account)
+    monkeypatch.setattr(sharded, 'relay', lambda shard=None, limit=500: 0)
+    assert sharded.transfer_funds(payer, payee_account, 100)
+    monkeypatch.undo()
+
+    # The relay credited the payee and died before marking the outbox row delivered
+    shard = sharded.shard_for(payer)
+    row, = shard.db.execute_statement('pending_outbox', (10,), fetch=True)
+    assert sharded.shard_for(payee)._apply_credit(f"{shard.name}:{row['outbox_id']}", payee, row['amount'])
+
+    assert sharded.relay() == 0
+    assert balance(sharded, payee) == Decimal('1100')
+    assert shard.db.execute_statement('pending_outbox', (10,), fetch=True) == []
+
+
+def test_bulk_transfers_across_shards_are_relayed(sharded):
+    payer, payee = users_on_two_shards(sharded)
+    payee_account = account_number(sharded, payee)
+    assert sharded.add_beneficiaries(payer, 'Payee', payee_account)
+    assert sharded.add_beneficiaries(payer, 'Outside', '1111111111')
+
+    results = list(sharded.transfer_funds_bulk([(payer, payee_account, 100), (payer, '1111111111', 50)]))
+
+    assert all(result.ok for result in results)
+    assert balance(sharded, payer) == Decimal('850')
+    # Accounts outside the bank are only debited
+    assert balance(sharded, payee) == Decimal('1100')
+
+
+def test_transfer_resolves_the_payee_once_before_its_transaction(sharded, monkeypatch):
+    payer, payee = users_on_two_shards(sharded)
+    payee_account = account_number(sharded, payee)
+    assert sharded.add_beneficiaries(payer, 'Payee', payee_account)
+    payees = sharded.payees
+    lookups = []
+    monkeypatch.setattr(sharded, 'payees', lambda accounts: lookups.append(1) or payees(accounts))
+
+    assert sharded.transfer_funds(payer, payee_account, 10)
+
+    assert len(lookups) == 1
+
+
+def test_adding_a_shard_keeps_existing_users_where_they_are(sharded, tmp_path, passwords):
+    payer, payee = users_on_two_shards(sharded)
+    placed = {user_id: sharded.shard_for(user_id).name for user_id in (payer, payee)}
+    databases = {name: bank.db for name, bank in sharded.shards.items()}
+    databases['north'] = Database(SQLiteBackend(str(tmp_path / 'north.db')))
+    grown = ShardedBankSystem(databases, sharded.directory, passwords=passwords)
+    grown.bootstrap()
+
+    assert {user_id: grown.shard_for(user_id).name for user_id in placed} == placed
+    assert grown.login('shard0', 'secret123') == payer
+    assert balance(grown, payee) == Decimal('1000')
+    databases['north'].close()
+
+
+def test_bootstrap_records_ring_placement_for_an_older_directory(tmp_path, passwords):
+    databases = {name: Database(SQLiteBackend(str(tmp_path / f'{name}.db'))) for name in ('east', 'west')}
+    directory = Database(SQLiteBackend(str(tmp_path / 'directory.db')))
+    directory.execute_query("CREATE TABLE shard_directory (username VARCHAR(20) PRIMARY KEY, "
+                            "user_id INT UNIQUE NOT NULL, account_number VARCHAR(10) UNIQUE NOT NULL)")
+    directory.execute_query("INSERT INTO shard_directory VALUES ('old', 7, '1234567890')")
+    bank = ShardedBankSystem(databases, directory, passwords=passwords)
+
+    bank.bootstrap()
+
+    assert bank.shard_for(7).name == bank.ring.shard_for(7)
+    for db in list(databases.values()) + [directory]:
+        db.close()
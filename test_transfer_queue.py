@@ -0,0 +1,115 @@
+from decimal import Decimal
+import pytest
+from banking import BankSystem
+from conftest import PAYEE, balance, register
+from transfer_queue import TransferQueue, run_worker
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = TransferQueue(str(tmp_path / 'jobs.db'))
+    yield queue
+    queue.close()
+
+
+def bank_path(bank):
+    return bank.db.backend.path
+
+
+def drain(queue, bank, **options):
+    run_worker(queue.path, 0, 1, bank_db=bank_path(bank), drain=True, poll_interval=0, **options)
+
+
+def test_enqueueing_the_same_keys_again_adds_nothing(queue):
+    transfers = [(1, PAYEE, 10, 'a'), (1, PAYEE, 20, 'b')]
+
+    assert queue.enqueue_many(transfers) == 2
+    assert queue.enqueue_many(transfers) == 0
+    assert queue.depth() == 2
+
+
+def test_worker_applies_jobs_and_records_outcomes(queue, bank):
+    user_id = register(bank, 'queued1')
+    queue.enqueue_many([(user_id, PAYEE, 100, 'pay'), (user_id, '1111111111', 5, 'unknown')])
+
+    drain(queue, bank)
+
+    assert queue.status('pay')['status'] == 'done'
+    assert queue.status('unknown')['status'] == 'rejected'
+    assert balance(bank, user_id) == Decimal('900')
+
+
+def test_rerun_after_a_crash_does_not_debit_twice(queue, bank):
+    user_id = register(bank, 'queued2')
+    queue.enqueue(user_id, PAYEE, 100, 'crash')
+    # A worker claims the job, applies the transfer and dies before recording it;
+    # its lease has already run out
+    job, = queue.claim(0, 1, lease=-1)
+    assert bank._apply_transfer(job.user_id, job.account_number, job.amount, job.idempotency_key)
+
+    drain(queue, bank)
+
+    assert queue.status('crash') == {'status': 'done', 'attempts': 2, 'error': None}
+    assert balance(bank, user_id) == Decimal('900')
+
+
+def test_database_error_requeues_the_job_and_the_rest_of_its_batch(queue, bank, monkeypatch):
+    user_id = register(bank, 'queued3')
+    queue.enqueue_many([(user_id, PAYEE, 100, 'first'), (user_id, PAYEE, 200, 'second')])
+    apply_transfer = BankSystem._apply_transfer
+    calls = []
+
+    def flaky(self, *args):
+        calls.append(args[3])
+        if len(calls) == 1:
+            raise bank.db.backend.errors[0]("database is locked")
+        return apply_transfer(self, *args)
+    monkeypatch.setattr(BankSystem, '_apply_transfer', flaky)
+
+    drain(queue, bank)
+
+    # The failed job runs again before the one behind it
+    assert calls == ['first', 'first', 'second']
+    assert queue.status('first') == {'status': 'done', 'attempts': 2, 'error': None}
+    assert queue.status('second')['status'] == 'done'
+    assert balance(bank, user_id) == Decimal('700')
+
+
+def test_job_fails_once_it_runs_out_of_attempts(queue, bank, monkeypatch):
+    user_id = register(bank, 'queued4')
+    queue.enqueue(user_id, PAYEE, 100, 'doomed')
+
+    def broken(self, *args):
+        raise bank.db.backend.errors[0]("database is locked")
+    monkeypatch.setattr(BankSystem, '_apply_transfer', broken)
+
+    drain(queue, bank, max_attempts=2)
+
+    assert queue.status('doomed') == {'status': 'failed', 'attempts': 2, 'error': 'database is locked'}
+
+
+def test_idempotency_key_applies_a_transfer_once(bank):
+    user_id = register(bank, 'keyed1')
+
+    assert bank.transfer_funds(user_id, PAYEE, 10, idempotency_key='once')
+    assert bank.transfer_funds(user_id, PAYEE, 10, idempotency_key='once')
+    assert balance(bank, user_id) == Decimal('990')
+
+
+def test_idempotency_keys_are_scoped_per_payer(bank):
+    alice = register(bank, 'keyed2')
+    bob = register(bank, 'keyed3')
+
+    assert bank.transfer_funds(alice, PAYEE, 10, idempotency_key='k1')
+    assert bank.transfer_funds(bob, PAYEE, 500, idempotency_key='k1')
+
+    assert balance(bank, alice) == Decimal('990')
+    assert balance(bank, bob) == Decimal('500')
+
+
+def test_reused_key_for_a_different_transfer_is_refused(bank):
+    user_id = register(bank, 'keyed4')
+
+    assert bank.transfer_funds(user_id, PAYEE, 10, idempotency_key='k1')
+    assert not bank.transfer_funds(user_id, PAYEE, 20, idempotency_key='k1')
+    assert balance(bank, user_id) == Decimal('990')
@@ -0,0 +1,61 @@
+import threading
+from decimal import Decimal
+from conftest import PAYEE, balance, register
+
+
+def test_concurrent_transfers_never_overdraw(bank):
+    user_id = register(bank, 'payer1')
+    results = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        for _ in range(5):
+            results.append(bank.transfer_funds(user_id, PAYEE, 30))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 1000 covers 33 transfers of 30; the other seven are refused
+    assert results.count(True) == 33
+    assert balance(bank, user_id) == Decimal('10')
+    ledger = bank.db.execute_query("SELECT COUNT(*) AS n FROM transactions WHERE user_id = %s", (user_id,), fetch=True)
+    assert ledger[0]['n'] == 33
+
+
+def test_transfer_is_refused_without_a_beneficiary(bank):
+    user_id = register(bank, 'payer2')
+
+    assert not bank.transfer_funds(user_id, '1111111111', 10)
+    assert balance(bank, user_id) == Decimal('1000')
+
+
+def test_bulk_transfers_apply_rows_against_running_balances(bank):
+    user_id = register(bank, 'bulk1')
+
+    results = list(bank.transfer_funds_bulk([(user_id, PAYEE, 600), (user_id, PAYEE, 600),
+                                             (user_id, '1111111111', 10), (user_id, PAYEE, 400)]))
+
+    assert [(r.ok, r.reason) for r in results] == [
+        (True, None), (False, 'insufficient funds'), (False, 'unknown beneficiary'), (True, None)]
+    assert balance(bank, user_id) == Decimal('0')
+
+
+def test_bulk_chunk_rolls_back_on_a_database_error(bank, monkeypatch):
+    first = register(bank, 'bulk2')
+    second = register(bank, 'bulk3')
+
+    def fail(*args):
+        raise bank.db.backend.errors[0]("disk I/O error")
+    # Runs inside the chunk's transaction, after the debits and ledger rows are written
+    monkeypatch.setattr(bank, '_record_debits', fail)
+
+    results = list(bank.transfer_funds_bulk([(first, PAYEE, 100), (second, PAYEE, 200)]))
+
+    assert [(r.ok, r.reason) for r in results] == [(False, 'database error'), (False, 'database error')]
+    assert balance(bank, first) == balance(bank, second) == Decimal('1000')
+    ledger = bank.db.execute_query("SELECT COUNT(*) AS n FROM transactions", fetch=True)
+    assert ledger[0]['n'] == 0
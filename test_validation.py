@@ -0,0 +1,45 @@
+import pytest
+from validation import REGISTRATION, REGISTRATION_FIELDS, validate_registrations
+
+VALID = {'username': 'alice1', 'password': 'secret123', 'name': 'Alice', 'address': '1 Road',
+         'aadhaar': '123412341234', 'mobile': '9876543210'}
+
+EDGE_VALUES = [
+    ('username', 'ali\nce'), ('username', 'alice\n'), ('username', 42), ('username', None), ('username', ''),
+    ('password', 'sec\nret123'), ('password', '\n\n\n\n\n\n'), ('password', b'secret123'), ('password', '     '),
+    ('name', '\n'), ('name', ' \t '), ('name', ''), ('name', 'A\nB'), ('name', 7),
+    ('address', '\n1 Road'), ('address', '   '), ('address', None),
+    ('aadhaar', '1234\n12341234'), ('aadhaar', 123412341234), ('aadhaar', ' 123412341234'),
+    ('mobile', '9876543210\n'), ('mobile', 9876543210), ('mobile', ''),
+]
+
+
+def columns_of(records):
+    return {field: [record[field] for record in records] for field in REGISTRATION_FIELDS}
+
+
+@pytest.mark.parametrize('field, value', EDGE_VALUES)
+def test_first_errors_matches_first_error_on_edge_values(field, value):
+    records = [VALID, dict(VALID, **{field: value}), VALID]
+
+    expected = [REGISTRATION.first_error(record, row) for row, record in enumerate(records)]
+
+    assert REGISTRATION.first_errors(columns_of(records)) == expected
+
+
+def test_first_errors_matches_first_error_across_a_mixed_batch():
+    records = [dict(VALID, **{field: value}) for field, value in EDGE_VALUES] + [VALID]
+    records.append(dict(VALID, username='x!', mobile='1'))
+
+    expected = [REGISTRATION.first_error(record, row) for row, record in enumerate(records)]
+
+    assert REGISTRATION.first_errors(columns_of(records)) == expected
+    assert expected[-2] is None
+    assert expected[-1].field == 'username'
+
+
+def test_validate_registrations_reports_malformed_rows():
+    results = validate_registrations([VALID, {'username': 'bob'}, 'not a row', dict(VALID, name=' ')])
+
+    assert results == [None, "Missing or malformed registration fields.",
+                       "Missing or malformed registration fields.", "Name cannot be empty."]
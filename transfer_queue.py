@@ -0,0 +1,360 @@
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+import uuid
+from collections import namedtuple
+from decimal import Decimal
+
+# Jobs hash to a fixed number of partitions by user_id; worker i of n owns the
+# partitions p with p % n == i, so one account's transfers always run in
+# order on one worker and never contend for the same row lock.
+PARTITIONS = 64
+
+TransferJob = namedtuple('TransferJob', ['job_id', 'idempotency_key', 'user_id', 'account_number', 'amount', 'attempts'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transfer_jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT UNIQUE NOT NULL,
+    user_id INTEGER NOT NULL,
+    account_number TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    partition INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'rejected', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    lease_until REAL,
+    finished_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transfer_jobs_status ON transfer_jobs (status, partition, job_id);
+CREATE INDEX IF NOT EXISTS idx_transfer_jobs_finished ON transfer_jobs (finished_at);
+"""
+
+
+class QueueFull(Exception):
+    """Raised when the queue stays at max_depth for longer than the enqueue timeout."""
+
+
+class TransferQueue:
+    """Durable transfer job queue in a local SQLite file, shared by producers and worker processes.
+
+    Jobs are claimed in batches under a lease; a worker that dies leaves its
+    jobs to be claimed again once the lease runs out, and the idempotency
+    key recorded with each transfer keeps the rerun from debiting twice.
+    """
+
+    def __init__(self, path, max_depth=100000, timeout=30.0):
+        self.path = path
+        self.max_depth = max_depth
+        self.timeout = timeout
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def depth(self):
+        """Jobs waiting or running."""
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM transfer_jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def _wait_for_room(self, count):
+        """Backpressure: block while the queue is too deep to take count more jobs."""
+        deadline = time.monotonic() + self.timeout
+        while self.depth() + count > self.max_depth:
+            if time.monotonic() >= deadline:
+                raise QueueFull(f"Transfer queue still at {self.max_depth} jobs after {self.timeout}s")
+            time.sleep(0.05)
+
+    def enqueue_many(self, transfers):
+        """Queue (user_id, account_number, amount[, idempotency_key]) tuples in one transaction.
+
+        A key that is already queued or finished is ignored. Transfers without
+        a key get a random one and are never recognised as repeats, so only
+        keyed transfers are safe to resubmit; read_transfers keys every row.
+        Returns the number of new jobs.
+        """
+        rows, now = [], time.time()
+        for transfer in transfers:
+            user_id, account_number, amount = transfer[:3]
+            key = transfer[3] if len(transfer) > 3 and transfer[3] else uuid.uuid4().hex
+            rows.append((key, int(user_id), str(account_number), str(Decimal(str(amount))), int(user_id) % PARTITIONS, now))
+        if not rows:
+            return 0
+        self._wait_for_room(len(rows))
+        before = self._conn.total_changes
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._conn.executemany("""
+            INSERT OR IGNORE INTO transfer_jobs (idempotency_key, user_id, account_number, amount, partition, enqueued_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+            self._conn.execute('COMMIT')
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        return self._conn.total_changes - before
+
+    def enqueue(self, user_id, account_number, amount, idempotency_key=None):
+        """Queue one transfer, returning its idempotency key."""
+        key = idempotency_key or uuid.uuid4().hex
+        self.enqueue_many([(user_id, account_number, amount, key)])
+        return key
+
+    def claim(self, worker, workers, limit=100, lease=30.0):
+        """Lease up to limit runnable jobs from the worker's partitions, oldest first.
+
+        Jobs still marked running whose lease has expired are taken back, so
+        a crashed worker's batch is picked up by its replacement.
+        """
+        partitions = [p for p in range(PARTITIONS) if p % workers == worker]
+        placeholders = ', '.join('?' * len(partitions))
+        now = time.time()
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = self._conn.execute(f"""
+            SELECT job_id, idempotency_key, user_id, account_number, amount, attempts FROM transfer_jobs
+            WHERE partition IN ({placeholders})
+            AND (status = 'queued' OR (status = 'running' AND lease_until < ?))
+            ORDER BY job_id LIMIT ?
+            """, partitions + [now, limit]).fetchall()
+            self._conn.executemany(
+                "UPDATE transfer_jobs SET status = 'running', lease_until = ?, attempts = attempts + 1 WHERE job_id = ?",
+                [(now + lease, row[0]) for row in rows])
+            self._conn.execute('COMMIT')
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        return [TransferJob(job_id, key, user_id, account, Decimal(amount), attempts + 1)
+                for job_id, key, user_id, account, amount, attempts in rows]
+
+    def finish(self, outcomes):
+        """Record (job_id, status, error) outcomes for claimed jobs in one transaction."""
+        if not outcomes:
+            return
+        now = time.time()
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._conn.executemany("""
+            UPDATE transfer_jobs SET status = ?, error = ?, lease_until = NULL,
+                finished_at = CASE WHEN ? = 'queued' THEN NULL ELSE ? END
+            WHERE job_id = ?
+            """, [(status, error, status, now, job_id) for job_id, status, error in outcomes])
+            self._conn.execute('COMMIT')
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+
+    def status(self, idempotency_key):
+        """Status, attempts and error for one job, or None if the key is unknown."""
+        row = self._conn.execute(
+            "SELECT status, attempts, error FROM transfer_jobs WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+        return dict(zip(('status', 'attempts', 'error'), row)) if row else None
+
+    def purge(self, older_than):
+        """Delete finished jobs older than older_than seconds, returning how many went."""
+        cursor = self._conn.execute(
+            "DELETE FROM transfer_jobs WHERE status IN ('done', 'rejected', 'failed') AND finished_at < ?",
+            (time.time() - older_than,))
+        return cursor.rowcount
+
+    def metrics(self, window=60.0):
+        """Queue depth by status, plus throughput and enqueue-to-finish latency over the last window seconds."""
+        counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM transfer_jobs GROUP BY status").fetchall())
+        since = time.time() - window
+        latencies = sorted(row[0] for row in self._conn.execute(
+            "SELECT finished_at - enqueued_at FROM transfer_jobs WHERE finished_at >= ?", (since,)))
+
+        def percentile(p):
+            return round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))], 3) if latencies else 0.0
+
+        return {
+            'depth': counts.get('queued', 0) + counts.get('running', 0),
+            'by_status': {status: counts.get(status, 0) for status in ('queued', 'running', 'done', 'rejected', 'failed')},
+            'throughput': round(len(latencies) / window, 2),
+            'latency_p50_ms': percentile(50),
+            'latency_p95_ms': percentile(95),
+            'latency_p99_ms': percentile(99),
+        }
+
+
+def run_worker(queue_path, worker, workers, bank_db=None, batch_size=100, lease=30.0,
+               max_attempts=5, poll_interval=0.2, drain=False, stop=None):
+    """Process loop for one worker: claim a batch from owned partitions, transfer each job in order, record outcomes.
+
+    bank_db is an SQLite file for the bank, or None for the configured MySQL
+    server. With drain, the worker exits once its partitions are empty.
+    """
+    from backends import SQLiteBackend
+    from banking import BankSystem
+    from database import Database
+
+    queue = TransferQueue(queue_path)
+    db = Database(SQLiteBackend(bank_db)) if bank_db else Database()
+    bank = BankSystem(db)
+    try:
+        while stop is None or not stop.is_set():
+            jobs = queue.claim(worker, workers, batch_size, lease)
+            if not jobs:
+                if drain:
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            outcomes = []
+            for i, job in enumerate(jobs):
+                try:
+                    applied = bank._apply_transfer(job.user_id, job.account_number, job.amount, job.idempotency_key)
+                except db.errors as e:
+                    # Put this job and the rest of the batch back in order so
+                    # later transfers for the account do not overtake it
+                    status = 'failed' if job.attempts >= max_attempts else 'queued'
+                    outcomes.append((job.job_id, status, str(e)))
+                    outcomes.extend((later.job_id, 'queued', None) for later in jobs[i + 1:])
+                    time.sleep(poll_interval)
+                    break
+                except Exception as e:
+                    # A bug or bad row must not take down the worker that owns these partitions
+                    outcomes.append((job.job_id, 'failed', f"{type(e).__name__}: {e}"))
+                    continue
+                outcomes.append((job.job_id, 'done' if applied else 'rejected',
+                                 None if applied else 'insufficient funds or unknown beneficiary'))
+            queue.finish(outcomes)
+    finally:
+        db.close()
+        bank.passwords.close()
+        queue.close()
+
+
+class TransferWorkers:
+    """A pool of worker processes draining a TransferQueue."""
+
+    def __init__(self, queue_path, workers=None, bank_db=None, **options):
+        self.queue_path = queue_path
+        self.workers = workers or os.cpu_count() or 1
+        self.bank_db = bank_db
+        self.options = options
+        self._stop = multiprocessing.Event()
+        self._processes = []
+        self._drain = False
+        self.restarts = 0
+
+    def _spawn(self, worker):
+        process = multiprocessing.Process(target=run_worker, args=(self.queue_path, worker, self.workers, self.bank_db),
+                                          kwargs=dict(self.options, drain=self._drain, stop=self._stop), daemon=True)
+        process.start()
+        return process
+
+    def start(self, drain=False):
+        """Launch one process per worker."""
+        TransferQueue(self.queue_path).close()  # create the schema before workers race for it
+        self._stop.clear()
+        self._drain = drain
+        self._processes = [self._spawn(i) for i in range(self.workers)]
+
+    def join(self, timeout=None):
+        for process in self._processes:
+            process.join(timeout)
+
+    def supervise(self, poll_interval=1.0):
+        """Wait for the workers, restarting any that die before they are stopped or drain their partitions.
+
+        Partitions are fixed per worker, so a dead worker's accounts would
+        otherwise wait until the pool is restarted.
+        """
+        while not self._stop.is_set():
+            running = False
+            for i, process in enumerate(self._processes):
+                if process.is_alive():
+                    running = True
+                elif process.exitcode != 0:
+                    print(f"Worker {i} exited with code {process.exitcode}; restarting it")
+                    self.restarts += 1
+                    self._processes[i] = self._spawn(i)
+                    running = True
+            if not running:
+                return
+            self._stop.wait(poll_interval)
+        self.join()
+
+    def stop(self, timeout=30.0):
+        """Ask workers to finish their current batch and exit."""
+        self._stop.set()
+        self.join(timeout)
+
+
+def read_transfers(path):
+    """Stream (user_id, account_number, amount, idempotency_key) from a CSV (with a header row) or JSONL file.
+
+    Rows without an idempotency_key get one derived from the file's path, the
+    row's position and its content, so enqueueing the same file again adds
+    nothing.
+    """
+
+    source = os.path.abspath(path)
+    with open(path, newline='') as f:
+        rows = (json.loads(line) for line in f if line.strip()) if path.endswith(('.jsonl', '.json')) else csv.DictReader(f)
+        for number, row in enumerate(rows, 1):
+            key = row.get('idempotency_key')
+            if not key:
+                content = json.dumps(row, sort_keys=True, default=str)
+                key = hashlib.blake2b(f"{source}\0{number}\0{content}".encode(), digest_size=16).hexdigest()
+            yield row['user_id'], row['account_number'], row['amount'], key
+
+
+def main():
+    """Command line entry point: enqueue transfer files, run workers, report metrics."""
+
+    parser = argparse.ArgumentParser(description="Durable background transfer queue.")
+    parser.add_argument('--queue', default='transfer_queue.db', help="Queue database file")
+    parser.add_argument('--sqlite', metavar='DB', help="Use an SQLite bank database file instead of MySQL")
+    sub = parser.add_subparsers(dest='command', required=True)
+    enqueue = sub.add_parser('enqueue', help="Queue transfers from a CSV or JSONL file")
+    enqueue.add_argument('path')
+    enqueue.add_argument('--max-depth', type=int, default=100000, help="Block when this many jobs are pending")
+    work = sub.add_parser('work', help="Run worker processes")
+    work.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    work.add_argument('--batch-size', type=int, default=100)
+    work.add_argument('--drain', action='store_true', help="Exit once the queue is empty")
+    sub.add_parser('metrics', help="Print queue depth, throughput and latency")
+    purge = sub.add_parser('purge', help="Delete finished jobs")
+    purge.add_argument('--days', type=float, default=7.0)
+    args = parser.parse_args()
+
+    if args.command == 'work':
+        pool = TransferWorkers(args.queue, args.workers, args.sqlite, batch_size=args.batch_size)
+        pool.start(drain=args.drain)
+        try:
+            pool.supervise()
+        except KeyboardInterrupt:
+            pool.stop()
+        return
+
+    queue = TransferQueue(args.queue, max_depth=getattr(args, 'max_depth', 100000))
+    try:
+        if args.command == 'enqueue':
+            added, batch = 0, []
+            for transfer in read_transfers(args.path):
+                batch.append(transfer)
+                if len(batch) >= 1000:
+                    added += queue.enqueue_many(batch)
+                    batch = []
+            added += queue.enqueue_many(batch)
+            print(f"{added} transfers queued")
+        elif args.command == 'purge':
+            print(f"{queue.purge(args.days * 86400)} finished jobs deleted")
+        else:
+            print(json.dumps(queue.metrics(), indent=2))
+    finally:
+        queue.close()
+
+if __name__ == "__main__":
+    main()
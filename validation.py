@@ -1,50 +1,161 @@
 import re
+from collections import namedtuple
+from itertools import compress
+from operator import not_
+
+USERNAME_RE = re.compile(r"[a-zA-Z0-9]{3,20}")
+AADHAAR_RE = re.compile(r"\d{12}")
+MOBILE_RE = re.compile(r"\d{10}")
+ACCOUNT_NUMBER_RE = re.compile(r"\d{10}")
+PIN_RE = re.compile(r"\d{4}")
+MIN_PASSWORD_RE = re.compile(r".{6,}", re.DOTALL)
+NOT_BLANK_RE = re.compile(r"\s*\S.*", re.DOTALL)
+
+REGISTRATION_FIELDS = ('username', 'password', 'name', 'address', 'aadhaar', 'mobile')
+
+# One failed check; row is the record's position in a batch (None for a single record).
+ValidationError = namedtuple('ValidationError', ['row', 'field', 'code', 'message'])
+
+class Rule:
+    """A precompiled check for one field: a full-match pattern or a predicate, and the error it reports.
+
+    ``digits`` marks fixed-width numeric fields, which NumPy string columns
+    check with array operations.
+    """
+
+    def __init__(self, field, code, message, pattern=None, check=None, digits=None):
+        self.field = field
+        self.code = code
+        self.message = message
+        self.digits = digits
+        self._match = pattern.fullmatch if pattern is not None else None
+        self._check = check
+
+    def valid(self, value):
+        """True if a single value passes."""
+        if self._match is not None:
+            return value.__class__ is str and self._match(value) is not None
+        try:
+            return bool(self._check(value))
+        except (TypeError, AttributeError):
+            return False
+
+    def column(self, values):
+        """Check a whole column, returning one truthy/falsy verdict per value."""
+        if type(values).__module__ == 'numpy':
+            if self.digits:
+                import numpy as np
+                values = values.astype(str)
+                return np.char.isdigit(values) & (np.char.str_len(values) == self.digits)
+            values = values.tolist()
+        return [self.valid(value) for value in values]
+
+    def error(self, row=None):
+        return ValidationError(row, self.field, self.code, self.message)
+
+def _failed(verdicts):
+    """Positions of the falsy verdicts in a column result."""
+    if type(verdicts).__module__ == 'numpy':
+        return (~verdicts).nonzero()[0].tolist()
+    return compress(range(len(verdicts)), map(not_, verdicts))
+
+class Validator:
+    """Applies field rules, in order, to single records or to whole columns at once."""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.fields = tuple(rule.field for rule in self.rules)
+
+    def errors(self, record, row=None):
+        """Every failed rule for one record (a dict keyed by field)."""
+        return [rule.error(row) for rule in self.rules if not rule.valid(record.get(rule.field))]
+
+    def first_error(self, record, row=None):
+        """The first failed rule for one record, or None if it is valid."""
+        rule = self.first_failure([record.get(field) for field in self.fields])
+        return rule.error(row) if rule else None
+
+    def first_failure(self, values):
+        """The first rule failed by values given in rule order, or None if they all pass."""
+        for rule, value in zip(self.rules, values):
+            if not rule.valid(value):
+                return rule
+        return None
+
+    def invalid_rows(self, field, values):
+        """Positions in a column that fail the field's rules."""
+        failed = set()
+        for rule in self.rules:
+            if rule.field == field:
+                ok = rule.column(values)
+                failed.update(_failed(ok))
+        return sorted(failed)
+
+    def first_errors(self, columns):
+        """The first failed rule (or None) per row of a table given as {field: column}, as first_error gives."""
+        columns = [columns[field] for field in self.fields]
+        columns = [column.tolist() if type(column).__module__ == 'numpy' else column for column in columns]
+        results = []
+        for i, values in enumerate(zip(*columns)):
+            rule = self.first_failure(values)
+            results.append(rule.error(i) if rule else None)
+        return results
+
+USERNAME_RULE = Rule('username', 'invalid_username',
+                     "Invalid username. It must be alphanumeric and between 3 to 20 characters.",
+                     USERNAME_RE)
+PASSWORD_RULE = Rule('password', 'password_too_short',
+                     "Password is too short. It must be at least 6 characters long.", MIN_PASSWORD_RE)
+NAME_RULE = Rule('name', 'empty_name', "Name cannot be empty.", NOT_BLANK_RE)
+ADDRESS_RULE = Rule('address', 'empty_address', "Address cannot be empty.", NOT_BLANK_RE)
+AADHAAR_RULE = Rule('aadhaar', 'invalid_aadhaar', "Invalid Aadhaar. It must be a 12-digit number.",
+                    AADHAAR_RE, digits=12)
+MOBILE_RULE = Rule('mobile', 'invalid_mobile', "Invalid mobile number. It must be a 10-digit number.",
+                   MOBILE_RE, digits=10)
+ACCOUNT_NUMBER_RULE = Rule('account_number', 'invalid_account_number',
+                           "Invalid account number. It must be a 10-digit number.",
+                           ACCOUNT_NUMBER_RE, digits=10)
+PIN_RULE = Rule('pin', 'invalid_pin', "Invalid PIN. It must be a 4-digit number.", PIN_RE, digits=4)
+
+REGISTRATION = Validator([USERNAME_RULE, PASSWORD_RULE, NAME_RULE, ADDRESS_RULE, AADHAAR_RULE, MOBILE_RULE])
+LOGIN = Validator([USERNAME_RULE, PASSWORD_RULE])
+
+def registration_error(username, password, name, address, aadhaar, mobile):
+    """Return the first problem with registration input, or None if it is valid."""
+
+    rule = REGISTRATION.first_failure((username, password, name, address, aadhaar, mobile))
+    return rule.message if rule else None
 
 def validate_registration(username, password, name, address, aadhaar, mobile):
     """Validate registration input data."""
 
-    if not re.match(r"^[a-zA-Z0-9]{3,20}$", username) :
-        print("Invalid username. It must be alphanumeric and between 3 to 20 characters.")
-        return False
-    
-    if len(password) < 6:
-        print("Password is too short. It must be at least 6 characters long.")
-        return False
-    
-    if not name.strip():
-        print("Name cannot be empty.")
-        return False
-    
-    if not address.strip():
-        print("Address cannot be empty.")
-        return False
-    
-    if not re.match(r"^\d{12}$", aadhaar):
-        print("Invalid Aadhaar. It must be a 12-digit number.")
-        return False
-    
-    if not re.match(r"^\d{10}$", mobile):
-        print("Invalid mobile number. It must be a 10-digit number.")
+    error = registration_error(username, password, name, address, aadhaar, mobile)
+    if error:
+        print(error)
         return False
     return True
 
+def validate_registrations(rows):
+    """Validate a batch of registration dicts without printing, returning an error (or None) per row."""
+
+    rows = list(rows)
+    malformed = [not isinstance(row, dict) or any(field not in row for field in REGISTRATION_FIELDS) for row in rows]
+    columns = {field: [None if bad else row[field] for row, bad in zip(rows, malformed)]
+               for field in REGISTRATION_FIELDS}
+    return ["Missing or malformed registration fields." if bad else (error.message if error else None)
+            for bad, error in zip(malformed, REGISTRATION.first_errors(columns))]
+
 def validate_login(username, password):
     """Validate login credentials format."""
 
-    if not re.match("^[a-zA-Z0-9]{3,20}$", username) :
-        return False
-    
-    if len(password) < 6 :
-        return False
-    
-    return True
+    return USERNAME_RULE.valid(username) and PASSWORD_RULE.valid(password)
 
 def validate_pin(pin):
     """Validate card PIN (4 digits)."""
 
-    return re.match(r"^\d{4}$", pin) is not None
+    return PIN_RULE.valid(pin)
 
 def validate_account_number(account_number):
     """Validate account number (simplified: 10 digits)."""
 
-    return re.match(r"^\d{10}$", account_number) is not None
\ No newline at end of file
+    return ACCOUNT_NUMBER_RULE.valid(account_number)